@@ -1,8 +1,15 @@
 from django.contrib import admin
 from django.apps import apps
 
+
+class AutoModelAdmin(admin.ModelAdmin):
+    # The default __str__ of several models reads their foreign keys; join
+    # them into the changelist query instead of fetching one per row
+    list_select_related = True
+
+
 for model in apps.get_models():
     try:
-        admin.site.register(model)
+        admin.site.register(model, AutoModelAdmin)
     except admin.sites.AlreadyRegistered:
         pass
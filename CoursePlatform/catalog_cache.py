@@ -0,0 +1,102 @@
+"""
+Result cache for the course catalog listing.
+
+Each ``course_list`` page is cached as the ordered list of course ids it
+showed plus its pagination cursors, keyed on the normalised filter
+parameters. Entries live in a bounded per-process LRU with a TTL, and every
+key embeds the catalog *generation*, a counter kept in the shared Django
+cache and bumped whenever a ``Course`` is saved or deleted, so an edit makes
+every older entry unreachable in all worker processes at once.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .search import tokenize
+
+GENERATION_KEY = "courseplatform:catalog-generation"
+
+CachedPage = namedtuple("CachedPage", ["ids", "next_cursor", "previous_cursor"])
+
+
+class LRUCache:
+    """A small thread-safe LRU mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_pages = LRUCache(
+    maxsize=getattr(settings, "COURSE_LIST_CACHE_SIZE", 512),
+    ttl=getattr(settings, "COURSE_LIST_CACHE_TTL", 300),
+)
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so a flushed or restarted cache never reuses
+        # a generation number that older entries were stored under.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def make_key(search="", level="", published="", cursor=""):
+    """Build the cache key for one catalog page from its request parameters."""
+    terms = " ".join(tokenize(search))
+    if published not in ("true", "false"):
+        published = ""
+    return (get_generation(), terms, level, published, cursor or "")
+
+
+def get_page(key):
+    return _pages.get(key)
+
+
+def set_page(key, page):
+    _pages.set(key, CachedPage([course.pk for course in page], page.next_cursor, page.previous_cursor))
+
+
+def clear():
+    """Drop this process's cached pages (the generation is left alone)."""
+    _pages.clear()
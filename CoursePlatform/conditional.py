@@ -0,0 +1,99 @@
+"""
+Conditional GET for the public course pages.
+
+Anonymous visitors all see the same catalog and course pages, so those
+responses carry an ``ETag`` that ``condition`` checks before the view runs: a browser or reverse proxy revalidating an unchanged
+page gets a 304 without the page being queried or rendered. They are also
+marked ``public`` for ``COURSE_PAGE_MAX_AGE`` seconds so a reverse proxy can
+share them, unless the page embeds a CSRF token or sets a cookie: those are
+per visitor, so they are ``private`` and go out without an ``ETag``. A 304
+skips the view and can't tell whether the page would have set a cookie, but
+since only public pages hand out validators, every 304 refreshes a public
+copy and is marked ``public`` like it.
+
+Signed-in users see personalised pages (their name, their enrollment) and
+get neither validators nor shared caching; their responses are ``private``.
+
+Catalog pages change whenever any course does, which bumps the catalog
+generation (see ``catalog_cache``), so the generation is their version. A
+course page also depends on its curriculum and enrollment counts, which change
+without touching ``Course.updated_at``, and on its similar courses, so its
+ETag covers all of them. No ``Last-Modified`` is sent: those changes leave no
+timestamp behind, and a stale one would validate an outdated page for
+clients that only send ``If-Modified-Since``.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import catalog_cache
+from .models import Course
+from .stats import get_enrollment_stats
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def is_shared(request):
+    """Whether ``request`` gets the page every anonymous visitor gets."""
+    # Pending flash messages are rendered into the page once, so they are
+    # never answered from a cache
+    return not request.user.is_authenticated and not get_messages(request)
+
+
+def catalog_version(request, *args, **kwargs):
+    """ETag of the catalog as a whole."""
+    return make_etag("catalog", catalog_cache.get_generation())
+
+
+def course_version(request, pk):
+    """ETag of one course page: one query, plus the enrollment stats when not cached."""
+    row = (
+        Course.objects.filter(pk=pk)
+        .values("pk")
+        .annotate(videos_updated=Max("videos__updated_at"), video_count=Count("videos"))
+        .values_list("updated_at", "students_enrolled", "videos_updated", "video_count")
+        .first()
+    )
+    if row is None:
+        return None
+    stats = sorted(get_enrollment_stats(pk).items())
+    return make_etag("course", pk, catalog_cache.get_generation(), *row, stats)
+
+
+def public_page(version):
+    """
+    Make a view's anonymous responses conditional and publicly cacheable.
+
+    ``version(request, *args, **kwargs)`` returns the page's ETag without
+    rendering it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            shared = is_shared(request)
+            etag = None
+            if shared and request.method in ("GET", "HEAD"):
+                etag = version(request, *args, **kwargs)
+            conditional_view = condition(etag_func=lambda *args, **kwargs: etag)(view)
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            patch_vary_headers(response, ("Cookie",))
+            if shared and not response.cookies and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+                patch_cache_control(response, public=True, max_age=settings.COURSE_PAGE_MAX_AGE)
+            else:
+                patch_cache_control(response, private=True)
+                # No validator for a per-visitor page, so no 304 can stand in for it
+                del response["ETag"]
+            return response
+
+        return wrapper
+
+    return decorator
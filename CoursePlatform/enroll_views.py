@@ -12,24 +12,19 @@ def enroll_course(request, course_id):
         course = Course.objects.get(id=course_id, is_published=True)
         
         # Check if user is already enrolled
-        if Enrollment.objects.filter(user=request.user, course=course).exists():
+        if Enrollment.objects.filter(student=request.user, course=course).exists():
             return JsonResponse({
                 'success': True,
                 'message': 'You are already enrolled in this course',
                 'redirect_url': f'/courses/{course.id}/'
             })
         
-        # Create enrollment
-        enrollment = Enrollment.objects.create(
-            user=request.user,
+        # Create enrollment; Enrollment.save() keeps students_enrolled in step
+        Enrollment.objects.create(
+            student=request.user,
             course=course,
-            is_active=True
         )
         
-        # Update enrolled students count
-        course.students_enrolled += 1
-        course.save()
-        
         return JsonResponse({
             'success': True,
             'message': 'Successfully enrolled in the course',
@@ -0,0 +1,246 @@
+"""
+A loopback stand-in for the parts of the Stripe API the payment views use:
+Customers, PaymentMethod attach, PaymentIntents, Checkout Sessions, Products
+and Prices. It answers over real HTTP, so stripe-python (sync and async)
+exercises its full request path, and it honours idempotency keys the way
+Stripe does.
+
+Used by the ``bench_payments`` command, and usable on its own::
+
+    with FakeStripe(latency=0.05) as fake:
+        ...  # stripe.api_base and settings.STRIPE_API_BASE point at fake.url
+
+The payment method ``pm_card_chargeDeclined`` is declined, as in test mode.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import stripe
+from django.test.utils import override_settings
+
+DECLINED_PAYMENT_METHOD = 'pm_card_chargeDeclined'
+
+OBJECT_ID = re.compile(r'^[a-z]{2,5}_')
+
+
+def parse_form(body):
+    """Decode Stripe's form encoding, turning ``a[b][c]=v`` into nested dicts."""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = key.replace(']', '').split('[')
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return params
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Build a ``Stripe-Signature`` header for ``payload`` (a str)."""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class FakeStripe:
+    def __init__(self, latency=0.0, jitter=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.objects = {}
+        self.requests = Counter()
+        # Ids are unique across instances, so objects persisted by one run
+        # (e.g. StripeEvent rows) never collide with the next
+        self.namespace = f'fake{uuid.uuid4().hex[:8]}'
+        self._idempotent = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+        self._overrides = None
+        self._previous_api_base = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        self._previous_api_base = stripe.api_base
+        stripe.api_base = self.url
+        self._overrides = override_settings(STRIPE_API_BASE=self.url)
+        self._overrides.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._overrides.disable()
+        stripe.api_base = self._previous_api_base
+        self.stop()
+
+    def new_id(self, prefix):
+        return f'{prefix}_{self.namespace}{next(self._ids):06d}'
+
+    # Request handling -------------------------------------------------------
+
+    def handle(self, method, path, params, idempotency_key):
+        """Return ``(status, body)`` for one API request."""
+        if method == 'POST' and idempotency_key:
+            with self._lock:
+                cached = self._idempotent.get(idempotency_key)
+            if cached is not None:
+                return cached
+
+        parts = path.strip('/').split('/')[1:]  # drop the "v1" prefix
+        endpoint = '/'.join('{id}' if OBJECT_ID.match(part) else part for part in parts)
+        with self._lock:
+            self.requests[f'{method} /v1/{endpoint}'] += 1
+        status, body = self.route(method, parts, params)
+
+        if method == 'POST' and idempotency_key and status < 500:
+            with self._lock:
+                self._idempotent[idempotency_key] = (status, body)
+        return status, body
+
+    def route(self, method, parts, params):
+        if parts[:2] == ['checkout', 'sessions']:
+            parts = ['checkout.session'] + parts[2:]
+        resource = parts[0] if parts else ''
+        if resource == 'payment_methods' and len(parts) >= 2:
+            payment_method = self.payment_method(parts[1])
+            if method == 'POST' and parts[2:] == ['attach']:
+                payment_method['customer'] = params.get('customer')
+            return 200, payment_method
+        if method == 'GET' and len(parts) == 2:
+            obj = self.objects.get(parts[1])
+            return (200, obj) if obj else self.error(404, 'invalid_request_error', 'No such object')
+        if method != 'POST':
+            return self.error(404, 'invalid_request_error', 'Unrecognized request URL')
+
+        if resource == 'customers' and len(parts) == 1:
+            customer = self.store('cus', 'customer', params)
+            if params.get('payment_method'):
+                self.payment_method(params['payment_method'])['customer'] = customer['id']
+            return 200, customer
+        if resource == 'payment_intents' and len(parts) == 1:
+            return self.create_payment_intent(params)
+        if resource == 'checkout.session' and len(parts) == 1:
+            session = self.store(
+                'cs', 'checkout.session', params,
+                amount_total=self.line_items_total(params.get('line_items', {})),
+                payment_status='unpaid',
+                status='open',
+            )
+            session['url'] = f"https://checkout.stripe.com/c/pay/{session['id']}"
+            return 200, session
+        if resource in ('products', 'prices'):
+            if len(parts) == 1:
+                return 200, self.store('prod' if resource == 'products' else 'price', resource[:-1], params)
+            obj = self.objects.get(parts[1])
+            if obj is None:
+                return self.error(404, 'invalid_request_error', f'No such {resource[:-1]}')
+            obj.update(params)
+            return 200, obj
+        return self.error(404, 'invalid_request_error', 'Unrecognized request URL')
+
+    def store(self, prefix, object_name, params, **extra):
+        obj = {**params, **extra, 'id': self.new_id(prefix), 'object': object_name}
+        with self._lock:
+            self.objects[obj['id']] = obj
+        return obj
+
+    def payment_method(self, payment_method_id):
+        """Any ``pm_`` id exists, as Stripe's test cards do; attachments are tracked."""
+        with self._lock:
+            return self.objects.setdefault(
+                payment_method_id,
+                {'id': payment_method_id, 'object': 'payment_method', 'customer': None},
+            )
+
+    def create_payment_intent(self, params):
+        if params.get('payment_method') == DECLINED_PAYMENT_METHOD:
+            return self.error(402, 'card_error', 'Your card was declined.', code='card_declined')
+        amount = int(params.get('amount', 0))
+        status = 'succeeded' if params.get('confirm') == 'true' else 'requires_confirmation'
+        intent = self.store(
+            'pi', 'payment_intent', params,
+            amount=amount,
+            amount_received=amount if status == 'succeeded' else 0,
+            status=status,
+        )
+        intent['client_secret'] = f"{intent['id']}_secret_fake"
+        return 200, intent
+
+    def line_items_total(self, line_items):
+        total = 0
+        for item in line_items.values():
+            price = self.objects.get(item.get('price'), {})
+            unit_amount = price.get('unit_amount') or item.get('price_data', {}).get('unit_amount', 0)
+            total += int(unit_amount) * int(item.get('quantity', 1))
+        return total
+
+    @staticmethod
+    def error(status, error_type, message, **extra):
+        return status, {'error': {'type': error_type, 'message': message, **extra}}
+
+    def checkout_completed_event(self, session_id):
+        """
+        A ``checkout.session.completed`` event for a session created here,
+        marked paid, as Stripe would deliver it to the webhook.
+        """
+        session = dict(self.objects[session_id], payment_status='paid', status='complete')
+        session.setdefault('payment_intent', self.new_id('pi'))
+        return {
+            'id': self.new_id('evt'),
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': session},
+        }
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                params = parse_form(self.rfile.read(length).decode()) if length else {}
+                if fake.latency or fake.jitter:
+                    time.sleep(fake.latency + random.uniform(0, fake.jitter))
+                status, body = fake.handle(
+                    self.command, self.path.split('?')[0], params, self.headers.get('Idempotency-Key')
+                )
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Request-Id', f'req_fake{id(body)}')
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = _respond
+
+        return Handler
@@ -2,8 +2,11 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date
+from bisect import bisect_left
+from django.db import transaction
 from .models import Course, CourseVideo
-from django.forms import inlineformset_factory
+from .youtube import parse_youtube_url
+from django.forms import BaseInlineFormSet, inlineformset_factory
 
 class CourseForm(forms.ModelForm):
     class Meta:
@@ -197,16 +200,163 @@ class CourseVideoForm(forms.ModelForm):
     def clean_youtube_url(self):
         url = self.cleaned_data.get('youtube_url')
         if url:
-            if 'youtube.com' not in url and 'youtu.be' not in url:
+            if not any(parse_youtube_url(url)):
                 raise forms.ValidationError('Please enter a valid YouTube URL')
         return url
 
 
+# Gap left between consecutive lessons when order values are (re)assigned,
+# so a lesson can later be moved or inserted by writing only its own row.
+ORDER_STEP = 10
+
+
+def _increasing_run(values):
+    """Indexes of a longest strictly increasing subsequence of ``values`` (None entries are skipped)."""
+    tails, tail_indexes, parents = [], [], {}
+    for index, value in enumerate(values):
+        if value is None:
+            continue
+        position = bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[position] = value
+            tail_indexes[position] = index
+        parents[index] = tail_indexes[position - 1] if position else None
+    run, index = [], tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        run.append(index)
+        index = parents[index]
+    return set(run)
+
+
+def sparse_order(current):
+    """
+    Given the stored ``order`` of each lesson listed in its new sequence
+    (None for new lessons), return the order values to store.
+
+    The longest run of lessons already in increasing order keeps its values;
+    the rest are slotted into the gaps between them. Only when a gap is too
+    narrow is the whole curriculum renumbered ``ORDER_STEP`` apart.
+    """
+    kept = _increasing_run(current)
+    result = list(current)
+    index = 0
+    while index < len(current):
+        if index in kept:
+            index += 1
+            continue
+        end = index
+        while end < len(current) and end not in kept:
+            end += 1
+        low = result[index - 1] if index else -1
+        count = end - index
+        if end == len(current):
+            values = [max(low, 0) + ORDER_STEP * (i + 1) for i in range(count)]
+        else:
+            step = (result[end] - low) // (count + 1)
+            if step < 1:
+                return [ORDER_STEP * (i + 1) for i in range(len(current))]
+            values = [low + step * (i + 1) for i in range(count)]
+        result[index:end] = values
+        index = end
+    return result
+
+
+class LoadedRowChoiceField(forms.ModelChoiceField):
+    """
+    The hidden ``id`` field of a formset row. Resolves the pk against the
+    rows the formset has already loaded instead of running one query per row.
+    """
+
+    def __init__(self, queryset, *, formset, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.formset = formset
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            pk = self.queryset.model._meta.pk.to_python(value)
+        except ValidationError:
+            pk = None
+        instance = self.formset._existing_object(pk) if pk is not None else None
+        return instance if instance is not None else super().to_python(value)
+
+
+class BaseCourseVideoFormSet(BaseInlineFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = LoadedRowChoiceField(
+            field.queryset, formset=self, initial=field.initial, required=False, widget=field.widget
+        )
+
+    def save_bulk(self):
+        """
+        Save the curriculum as a diff against the stored rows: one
+        bulk_create for new lessons, one bulk_update for edited or moved
+        ones and a single DELETE for removed ones, all in one transaction.
+        """
+        self.new_objects, self.changed_objects, self.deleted_objects = [], [], []
+        kept = []  # (submitted order, form position, form, stored order)
+        for position, form in enumerate(self.forms):
+            is_new = position >= self.initial_form_count() or form.instance.pk is None
+            if self.can_delete and self._should_delete_form(form):
+                if not is_new:
+                    self.deleted_objects.append(form.instance)
+                continue
+            if is_new and not form.has_changed():
+                continue
+            stored = None if is_new else form.initial.get('order')
+            kept.append((form.cleaned_data.get('order') or 0, position, form, stored))
+
+        kept.sort(key=lambda item: item[:2])
+        orders = sparse_order([stored for *_, stored in kept])
+
+        now = timezone.now()
+        update_fields = set()
+        for (_, _, form, stored), order in zip(kept, orders):
+            video = form.instance
+            video.order = order
+            if stored is None:
+                video = self.save_new(form, commit=False)
+                video.refresh_embed()
+                self.new_objects.append(video)
+                continue
+            fields = {name for name in form.changed_data if name in ('title', 'youtube_url')}
+            if order != stored:
+                fields.add('order')
+            if 'youtube_url' in fields:
+                video.refresh_embed()
+                fields.update(('video_id', 'embed_url'))
+            if fields:
+                video.updated_at = now
+                update_fields.update(fields, ('updated_at',))
+                self.changed_objects.append((video, sorted(fields)))
+
+        with transaction.atomic():
+            if self.deleted_objects:
+                CourseVideo.objects.filter(
+                    course=self.instance, pk__in=[video.pk for video in self.deleted_objects]
+                ).delete()
+            if self.changed_objects:
+                CourseVideo.objects.bulk_update(
+                    [video for video, _ in self.changed_objects], sorted(update_fields)
+                )
+            if self.new_objects:
+                CourseVideo.objects.bulk_create(self.new_objects)
+        return self.new_objects + [video for video, _ in self.changed_objects]
+
+
 # Create a formset for course videos
 CourseVideoFormSet = inlineformset_factory(
     Course, 
     CourseVideo, 
     form=CourseVideoForm,
+    formset=BaseCourseVideoFormSet,
     extra=1,
     can_delete=True,
     min_num=0,
@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+
+from CoursePlatform.models import Course
+from CoursePlatform.thumbnails import process_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Render responsive thumbnail variants for courses that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Rendering processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Re-render variants that already exist')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.exclude(Q(thumbnail='') | Q(thumbnail__isnull=True))
+        course_ids = [
+            pk for pk, thumbnail, source in courses.values_list('pk', 'thumbnail', 'thumbnail_variants__source')
+            if options['force'] or source != thumbnail
+        ]
+        if not course_ids:
+            self.stdout.write('All thumbnails already have variants')
+            return
+
+        workers = options['workers'] or os.cpu_count() or 1
+        updated = failed = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=workers) as threads:
+            def run(course_id):
+                try:
+                    return process_thumbnail(course_id, pool=pool, force=options['force'])
+                finally:
+                    close_old_connections()
+
+            futures = {threads.submit(run, course_id): course_id for course_id in course_ids}
+            for future in as_completed(futures):
+                try:
+                    updated += bool(future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'Course {futures[future]}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered variants for {updated} of {len(course_ids)} courses ({failed} failed)'
+        ))
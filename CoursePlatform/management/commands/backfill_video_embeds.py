@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from CoursePlatform.models import CourseVideo
+
+
+class Command(BaseCommand):
+    help = 'Fill CourseVideo.video_id and embed_url from youtube_url in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read and updated per batch')
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-parse every video, not only those without an embed URL',
+        )
+
+    def handle(self, *args, **options):
+        videos = CourseVideo.objects.order_by('pk').only('pk', 'youtube_url', 'video_id', 'embed_url')
+        if not options['all']:
+            videos = videos.filter(embed_url='')
+
+        last_pk, checked, updated = 0, 0, 0
+        while True:
+            batch = list(videos.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            checked += len(batch)
+
+            changed = []
+            for video in batch:
+                before = (video.video_id, video.embed_url)
+                video.refresh_embed()
+                if (video.video_id, video.embed_url) != before:
+                    changed.append(video)
+            if changed:
+                with transaction.atomic():
+                    CourseVideo.objects.bulk_update(changed, ['video_id', 'embed_url'])
+                updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} videos, updated {updated}'))
@@ -0,0 +1,312 @@
+import asyncio
+import io
+import itertools
+import json
+import logging
+import platform
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+
+import django
+import httpx
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from CoursePlatform.models import Course, Enrollment
+from myapp.sample_data import TOPICS, SyntheticDataGenerator
+from myproject.benchmarking import Timings, add_seed_data_argument, require_seed_data
+
+DEFAULT_MIX = 'browse=40,search=20,detail=30,login=5,enroll=5'
+SCENARIOS = ('browse', 'search', 'detail', 'login', 'enroll')
+
+BASE_URL = 'http://testserver'
+PASSWORD = 'bench-password'
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+NEXT_CURSOR = re.compile(r'[?&]cursor=([^"&\s]+)')
+
+# What a run writes, for the --seed-data guard
+WRITES = 'sample data, the benchmark users and their enrollments'
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight!r}')
+    if not any(mix.values()):
+        raise CommandError('The mix needs at least one scenario with a positive weight')
+    return mix
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of catalog browsing, search, course detail, login and enrollment '
+        'against the WSGI and ASGI applications in-process, with concurrent clients, '
+        'and report requests/s and latency percentiles per endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=1000, help='Scenarios to run per server')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Scenario weights (default: {DEFAULT_MIX})',
+        )
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0.05,
+            help='Seed a synthetic dataset of this scale (see populate_sample_data) if none exists '
+                 'for --seed; 0 uses the data already in the database',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the dataset and of the request sequence')
+        add_seed_data_argument(parser, WRITES)
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file as JSON')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        require_seed_data(options, WRITES)
+        self.prepare_dataset(options)
+        self.users = self.prepare_users(options['concurrency'])
+
+        # Popular courses first, weighted along a Zipf curve like the traffic
+        self.course_ids = list(
+            Course.objects.filter(is_published=True).order_by('-students_enrolled', 'pk').values_list('pk', flat=True)
+        )
+        if not self.course_ids:
+            raise CommandError('No published courses to benchmark; use --scale to seed some')
+        self.course_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.course_ids) + 1)))
+
+        names, weights = zip(*mix.items())
+        plan = Random(options['seed']).choices(names, weights=weights, k=options['requests'])
+        servers = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+
+        results = {}
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for server in servers:
+                    self.reset_enrollments()
+                    self.timings = Timings()
+                    started = time.perf_counter()
+                    if server == 'wsgi':
+                        self.run_wsgi(plan, options['concurrency'])
+                    else:
+                        asyncio.run(self.run_asgi(plan, options['concurrency']))
+                    elapsed = time.perf_counter() - started
+                    results[server] = self.report(server, options, elapsed)
+        finally:
+            request_logger.disabled = False
+            self.reset_enrollments()
+
+        if options['json_path']:
+            document = {
+                'meta': {
+                    'revision': git_revision(),
+                    'timestamp': timezone.now().isoformat(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connections['default'].vendor,
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'mix': mix,
+                    'scale': options['scale'],
+                    'seed': options['seed'],
+                },
+                'servers': results,
+            }
+            with open(options['json_path'], 'w') as output:
+                json.dump(document, output, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
+
+    # Setup
+
+    def prepare_dataset(self, options):
+        if not options['scale']:
+            return
+        generator = SyntheticDataGenerator(scale=options['scale'], seed=options['seed'], stdout=io.StringIO())
+        if get_user_model().objects.filter(username__startswith=generator.username_prefix).exists():
+            return
+        self.stdout.write(f"Seeding a scale {options['scale']:g} dataset (seed {options['seed']})...")
+        generator.run()
+        self.stdout.write(generator.summary())
+
+    def prepare_users(self, count):
+        """One user per client, with a known password for the login scenario."""
+        User = get_user_model()
+        password = make_password(PASSWORD)
+        usernames = [f'bench-http-{n}' for n in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([User(username=name, password=password) for name in usernames if name not in existing])
+        User.objects.filter(username__in=usernames).update(password=password)
+        return list(User.objects.filter(username__in=usernames).order_by('username'))
+
+    def reset_enrollments(self):
+        # Start each run with the same state, so runs across commits compare
+        for enrollment in Enrollment.objects.filter(student__in=self.users):
+            enrollment.delete()
+
+    # Scenarios: generators yielding (label, method, url, data) and receiving the response
+
+    def scenario_browse(self, rng, state):
+        response = yield 'catalog', 'GET', reverse('courseplatform:course_list'), None
+        cursor = NEXT_CURSOR.search(response.text) if response.status_code == 200 else None
+        if cursor and rng.random() < 0.5:
+            yield 'catalog next page', 'GET', f"{reverse('courseplatform:course_list')}?cursor={cursor.group(1)}", None
+
+    def scenario_search(self, rng, state):
+        yield 'search', 'GET', f"{reverse('courseplatform:course_list')}?search={rng.choice(TOPICS)}", None
+
+    def scenario_detail(self, rng, state):
+        course_id = rng.choices(self.course_ids, cum_weights=self.course_weights)[0]
+        yield 'course detail', 'GET', reverse('courseplatform:course_detail', args=[course_id]), None
+
+    def scenario_login(self, rng, state):
+        response = yield 'login form', 'GET', reverse('login'), None
+        token = CSRF_INPUT.search(response.text)
+        data = {
+            'username': state['user'].username,
+            'password': PASSWORD,
+            'csrfmiddlewaretoken': token.group(1) if token else '',
+        }
+        response = yield 'login', 'POST', reverse('login'), data
+        state['logged_in'] = response.status_code == 302
+
+    def scenario_enroll(self, rng, state):
+        if not state['logged_in']:
+            yield from self.scenario_login(rng, state)
+        course_id = rng.choices(self.course_ids, cum_weights=self.course_weights)[0]
+        yield 'enroll', 'POST', reverse('courseplatform:enroll_course', args=[course_id]), None
+
+    def steps(self, name, rng, state):
+        return getattr(self, f'scenario_{name}')(rng, state)
+
+    # Drivers
+
+    def run_wsgi(self, plan, concurrency):
+        application = get_wsgi_application()
+        work = iter(plan)
+        lock = threading.Lock()
+
+        def client_loop(user, seed):
+            rng = Random(seed)
+            state = {'user': user, 'logged_in': False}
+            # A view that raises is counted as a 500, not a crashed client
+            transport = httpx.WSGITransport(app=application, raise_app_exceptions=False)
+            with httpx.Client(transport=transport, base_url=BASE_URL) as client:
+                try:
+                    while True:
+                        with lock:
+                            name = next(work, None)
+                        if name is None:
+                            return
+                        scenario = self.steps(name, rng, state)
+                        response = None
+                        try:
+                            while True:
+                                label, method, url, data = scenario.send(response)
+                                started = time.perf_counter()
+                                try:
+                                    response = client.request(method, url, data=data)
+                                    ok = response.status_code < 400
+                                except httpx.HTTPError:
+                                    response, ok = None, False
+                                self.timings.add(label, time.perf_counter() - started, ok=ok)
+                                if response is None:
+                                    break
+                        except StopIteration:
+                            pass
+                finally:
+                    connections.close_all()
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(client_loop, self.users[:concurrency], range(concurrency)))
+
+    async def run_asgi(self, plan, concurrency):
+        application = get_asgi_application()
+        work = iter(plan)
+
+        async def client_loop(user, seed):
+            rng = Random(seed)
+            state = {'user': user, 'logged_in': False}
+            transport = httpx.ASGITransport(app=application, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+                for name in work:
+                    scenario = self.steps(name, rng, state)
+                    response = None
+                    try:
+                        while True:
+                            label, method, url, data = scenario.send(response)
+                            started = time.perf_counter()
+                            try:
+                                response = await client.request(method, url, data=data)
+                                ok = response.status_code < 400
+                            except httpx.HTTPError:
+                                response, ok = None, False
+                            self.timings.add(label, time.perf_counter() - started, ok=ok)
+                            if response is None:
+                                break
+                    except StopIteration:
+                        pass
+
+        await asyncio.gather(*(client_loop(user, seed) for seed, user in enumerate(self.users[:concurrency])))
+
+    # Reporting
+
+    def report(self, server, options, elapsed):
+        total = sum(len(samples) for samples in self.timings.samples.values())
+        errors = sum(self.timings.errors.values())
+        self.stdout.write(
+            f"{server.upper()}: {options['requests']} scenarios, {total} requests, "
+            f"concurrency {options['concurrency']}, {elapsed:.2f}s"
+        )
+        self.stdout.write('Latency in ms:')
+        for line in self.timings.report(elapsed):
+            self.stdout.write(f'  {line}')
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(f'{total / elapsed:.1f} requests/s, {errors} errors'))
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'requests': total,
+            'errors': errors,
+            'requests_per_s': round(total / elapsed, 2),
+            'endpoints': {
+                label: {
+                    **{key: round(value, 2) for key, value in self.timings.summary(label).items()},
+                    'requests_per_s': round(len(samples) / elapsed, 2),
+                }
+                for label, samples in sorted(self.timings.samples.items())
+            },
+        }
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from CoursePlatform.fake_stripe import FakeStripe, sign_payload
+from CoursePlatform.models import Course, Enrollment, StripeEvent
+from myproject.benchmarking import Timings, add_seed_data_argument, require_seed_data
+
+WEBHOOK_SECRET = 'whsec_bench'
+
+# What a run writes, for the --seed-data guard
+WRITES = 'a benchmark course, one user per purchase and their enrollments'
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent purchases through the real payment views against a '
+        'local fake Stripe and report latency percentiles and throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flow',
+            choices=['intent', 'async', 'checkout'],
+            default='intent',
+            help='intent: process_payment; async: process_payment_async; '
+                 'checkout: checkout session, webhook and success page',
+        )
+        parser.add_argument('--purchases', type=int, default=200, help='Number of purchases (one user each)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Purchases in flight at once')
+        parser.add_argument('--latency', type=float, default=50, help='Fake Stripe latency per call, in ms')
+        parser.add_argument('--jitter', type=float, default=0, help='Extra random latency per call, up to this many ms')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the benchmark course and users")
+        add_seed_data_argument(parser, WRITES)
+
+    def handle(self, *args, **options):
+        require_seed_data(options, WRITES)
+        run = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        course = Course.objects.create(
+            title=f'Benchmark course {run}',
+            price=499,
+            category='Benchmark',
+            is_published=True,
+        )
+        users = User.objects.bulk_create([
+            User(username=f'bench-{run}-{i}', email=f'bench-{run}-{i}@example.com')
+            for i in range(options['purchases'])
+        ])
+
+        self.timings = Timings()
+        self.fake = fake = FakeStripe(latency=options['latency'] / 1000, jitter=options['jitter'] / 1000)
+        # Failed requests are counted in the report rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            with fake, override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+            ):
+                started = time.perf_counter()
+                if options['flow'] == 'async':
+                    asyncio.run(self.run_async(users, course, options['concurrency']))
+                else:
+                    purchase = self.purchase_intent if options['flow'] == 'intent' else self.purchase_checkout
+                    with ThreadPoolExecutor(options['concurrency']) as pool:
+                        list(pool.map(lambda user: purchase(user, course), users))
+                elapsed = time.perf_counter() - started
+
+            enrolled = Enrollment.objects.filter(course=course).count()
+            self.report(options, elapsed, enrolled, fake)
+        finally:
+            request_logger.disabled = False
+            if not options['keep']:
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+                course.delete()
+                StripeEvent.objects.filter(event_id__startswith=f'evt_{fake.namespace}').delete()
+
+    def request(self, label, send):
+        started = time.perf_counter()
+        response = send()
+        self.timings.add(label, time.perf_counter() - started, ok=response.status_code < 400)
+        return response
+
+    async def arequest(self, label, send):
+        started = time.perf_counter()
+        response = await send()
+        self.timings.add(label, time.perf_counter() - started, ok=response.status_code < 400)
+        return response
+
+    def purchase_intent(self, user, course):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        body = json.dumps({'course_id': course.pk, 'payment_method_id': 'pm_card_visa'})
+        try:
+            started = time.perf_counter()
+            response = self.request('process_payment', lambda: client.post(
+                reverse('courseplatform:process_payment'), body, content_type='application/json'
+            ))
+            self.timings.add('purchase', time.perf_counter() - started, ok=response.status_code < 400)
+        finally:
+            connections.close_all()
+
+    def purchase_checkout(self, user, course):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        try:
+            started = time.perf_counter()
+            responses = [self.request('create_checkout_session', lambda: client.post(
+                reverse('courseplatform:create-checkout-session', args=[course.pk])
+            ))]
+            if responses[0].status_code < 400:
+                session_id = responses[0].json()['id']
+                payload = json.dumps(self.fake.checkout_completed_event(session_id))
+                responses.append(self.request('stripe_webhook', lambda: client.post(
+                    reverse('courseplatform:stripe-webhook'),
+                    payload,
+                    content_type='application/json',
+                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET),
+                )))
+                query = urlencode({'session_id': session_id, 'course_id': course.pk})
+                responses.append(self.request('payment_success', lambda: client.get(
+                    f"{reverse('courseplatform:payment-success')}?{query}"
+                )))
+            ok = all(response.status_code < 400 for response in responses)
+            self.timings.add('purchase', time.perf_counter() - started, ok=ok)
+        finally:
+            connections.close_all()
+
+    async def run_async(self, users, course, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        body = json.dumps({'course_id': course.pk, 'payment_method_id': 'pm_card_visa'})
+        url = reverse('courseplatform:process_payment_async')
+
+        async def purchase(user):
+            async with semaphore:
+                client = AsyncClient(raise_request_exception=False)
+                await client.aforce_login(user)
+                started = time.perf_counter()
+                response = await self.arequest('process_payment_async', lambda: client.post(
+                    url, body, content_type='application/json'
+                ))
+                self.timings.add('purchase', time.perf_counter() - started, ok=response.status_code < 400)
+
+        await asyncio.gather(*(purchase(user) for user in users))
+
+    def report(self, options, elapsed, enrolled, fake):
+        purchases = options['purchases']
+        self.stdout.write(
+            f"{options['flow']} flow: {purchases} purchases, concurrency {options['concurrency']}, "
+            f"fake Stripe latency {options['latency']:g}ms (+{options['jitter']:g}ms jitter)"
+        )
+        self.stdout.write('Latency in ms:')
+        for line in self.timings.report(elapsed):
+            self.stdout.write(f'  {line}')
+        stripe_calls = sum(fake.requests.values())
+        self.stdout.write(
+            f'Stripe calls: {stripe_calls} ({stripe_calls / purchases:.1f} per purchase) '
+            + ', '.join(f'{endpoint} x{count}' for endpoint, count in sorted(fake.requests.items()))
+        )
+        style = self.style.SUCCESS if enrolled == purchases else self.style.WARNING
+        self.stdout.write(style(
+            f'{enrolled}/{purchases} enrollments in {elapsed:.2f}s, {purchases / elapsed:.1f} purchases/s'
+        ))
@@ -0,0 +1,122 @@
+import multiprocessing
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from CoursePlatform.models import Course, Enrollment
+from myproject.benchmarking import Timings, add_seed_data_argument, require_seed_data
+from myproject.db import REPLICA_DB_ALIAS
+
+# What a run writes, for the --seed-data guard
+WRITES = 'benchmark courses and the users and enrollments of the writers'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure catalog read throughput while enrollments are being written. '
+        'Run once with SQLITE_PROFILE=development and once with production to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads')
+        parser.add_argument('--writers', type=int, default=2, help='Enrollment writer threads')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run')
+        parser.add_argument('--courses', type=int, default=50, help='Benchmark courses to read and enroll into')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the benchmark courses and users")
+        add_seed_data_argument(parser, WRITES)
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite measures the SQLite backend only')
+        require_seed_data(options, WRITES)
+
+        run = uuid.uuid4().hex[:8]
+        courses = Course.objects.bulk_create([
+            Course(title=f'Benchmark course {run} {i}', category='Benchmark', price=499, is_published=True)
+            for i in range(options['courses'])
+        ])
+        self.course_ids = [course.pk for course in courses]
+        self.timings = Timings()
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        read_alias = REPLICA_DB_ALIAS if REPLICA_DB_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+
+        # Separate processes, like the workers of a production server, so the
+        # readers and writers contend on SQLite's locks rather than on the GIL
+        roles = ['reader'] * options['readers'] + ['writer'] * options['writers']
+        connections.close_all()
+        try:
+            started = time.perf_counter()
+            deadline = time.time() + options['duration']
+            with ProcessPoolExecutor(len(roles), mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [
+                    pool.submit(work, role, f'bench-sqlite-{run}-{n}-', self.course_ids, deadline)
+                    for n, role in enumerate(roles)
+                ]
+                for future in futures:
+                    for label, seconds, ok in future.result():
+                        self.timings.add(label, seconds, ok=ok)
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                get_user_model().objects.filter(username__startswith=f'bench-sqlite-{run}-').delete()
+                Course.objects.filter(pk__in=self.course_ids).delete()
+
+        self.stdout.write(
+            f"SQLite profile {settings.SQLITE_PROFILE!r}: journal_mode={journal_mode}, reads on {read_alias!r}, "
+            f"{options['readers']} readers, {options['writers']} writers, {elapsed:.1f}s"
+        )
+        self.stdout.write('Latency in ms:')
+        for line in self.timings.report(elapsed):
+            self.stdout.write(f'  {line}')
+        reads = self.timings.summary('catalog read')
+        writes = self.timings.summary('enrollment write')
+        self.stdout.write(self.style.SUCCESS(
+            f"{reads['count'] / elapsed:.0f} reads/s ({reads['errors']} failed) while writing "
+            f"{writes['count'] / elapsed:.0f} enrollments/s ({writes['errors']} failed)"
+        ))
+
+
+def work(role, username_prefix, course_ids, deadline):
+    """Run reads or enrollment writes until ``deadline``; returns ``(label, seconds, ok)`` samples."""
+    User = get_user_model()
+    rng = random.Random()
+    samples = []
+    n = 0
+    try:
+        while time.time() < deadline:
+            course_id = rng.choice(course_ids)
+            started = time.perf_counter()
+            ok = True
+            try:
+                if role == 'reader':
+                    label = 'catalog read'
+                    # A catalog page plus the enrollment figures of one course
+                    list(
+                        Course.objects.filter(is_published=True, category='Benchmark')
+                        .order_by('-created_at', '-id')
+                        .values('id', 'title', 'price', 'students_enrolled')[:12]
+                    )
+                    Enrollment.objects.filter(course_id=course_id, status='active').count()
+                else:
+                    label = 'enrollment write'
+                    user = User.objects.create(username=f'{username_prefix}{n}')
+                    n += 1
+                    Enrollment.objects.create(
+                        student=user, course_id=course_id, payment_status='completed', payment_amount=499,
+                    )
+            except OperationalError:
+                ok = False
+            samples.append((label, time.perf_counter() - started, ok))
+    finally:
+        connections.close_all()
+    return samples
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from CoursePlatform import catalog_cache
+from CoursePlatform.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Precompute similar-course recommendations from co-enrollments, category and level'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=4, help='Neighbours stored per course')
+        parser.add_argument('--co-weight', type=float, default=1.0, help='Weight of co-enrollment similarity')
+        parser.add_argument('--category-weight', type=float, default=0.3, help='Bonus for a shared category')
+        parser.add_argument('--level-weight', type=float, default=0.1, help='Bonus for a similar level')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = build_recommendations(
+            top_n=options['top'],
+            co_weight=options['co_weight'],
+            category_weight=options['category_weight'],
+            level_weight=options['level_weight'],
+        )
+        # Course pages list their similar courses; expire their ETags
+        catalog_cache.bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {written} recommendations in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urljoin
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_MANIFEST = Path(__file__).resolve().parents[2] / 'assets.json'
+CHUNK_SIZE = 64 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Download the static images listed in an asset manifest into STATICFILES_DIRS, '
+        'concurrently, resuming partial downloads and verifying checksums'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manifest', default=str(DEFAULT_MANIFEST), help='Path of the JSON asset manifest')
+        parser.add_argument('--dest', default=None, help='Target directory (default: first STATICFILES_DIRS entry)')
+        parser.add_argument('--base-url', default=None, help="Override the manifest's base_url, e.g. a local mirror")
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Connect/read timeout per request, in seconds')
+        parser.add_argument('--retries', type=int, default=3, help='Attempts per asset')
+        parser.add_argument('--force', action='store_true', help='Download even if a valid file is present')
+        parser.add_argument(
+            '--update-manifest',
+            action='store_true',
+            help='Record the size and sha256 of assets that have none in the manifest',
+        )
+
+    def handle(self, *args, **options):
+        manifest_path = Path(options['manifest'])
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read manifest {manifest_path}: {error}')
+
+        dest = Path(options['dest'] or settings.STATICFILES_DIRS[0]).resolve()
+        base_url = options['base_url'] or manifest.get('base_url', '')
+        self.options = options
+
+        limits = httpx.Limits(max_connections=options['workers'], max_keepalive_connections=options['workers'])
+        timeout = httpx.Timeout(options['timeout'])
+        results = {'downloaded': 0, 'resumed': 0, 'present': 0, 'failed': 0}
+        # One client shared by all workers: connections are kept alive and reused
+        with httpx.Client(limits=limits, timeout=timeout, follow_redirects=True) as client, \
+                ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(self.fetch, client, urljoin(base_url, asset['url']), self.target(dest, asset), asset): asset
+                for asset in manifest['assets']
+            }
+            for future in as_completed(futures):
+                asset = futures[future]
+                try:
+                    outcome, size, digest = future.result()
+                except Exception as error:
+                    results['failed'] += 1
+                    self.stderr.write(self.style.ERROR(f"{asset['path']}: {error}"))
+                    continue
+                results[outcome] += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{asset['path']}: {outcome} ({size} bytes)")
+                if options['update_manifest'] and not asset.get('sha256'):
+                    asset['size'], asset['sha256'] = size, digest
+
+        if options['update_manifest']:
+            manifest_path.write_text(json.dumps(manifest, indent=2) + '\n')
+
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in results.items())
+        if results['failed']:
+            raise CommandError(f'Asset ingestion incomplete: {summary}')
+        self.stdout.write(self.style.SUCCESS(f'Assets up to date in {dest}: {summary}'))
+
+    @staticmethod
+    def target(dest, asset):
+        target = (dest / asset['path']).resolve()
+        if not target.is_relative_to(dest):
+            raise CommandError(f"Asset path escapes the destination: {asset['path']}")
+        return target
+
+    def fetch(self, client, url, target, asset):
+        """Make ``target`` a verified copy of ``url``; returns ``(outcome, size, sha256)``."""
+        if target.exists() and not self.options['force']:
+            size, digest = file_digest(target)
+            if asset.get('sha256') in (None, digest):
+                return 'present', size, digest
+
+        attempts = max(1, self.options['retries'])
+        for attempt in range(attempts):
+            try:
+                return self.download(client, url, target, asset)
+            except (httpx.TransportError, httpx.HTTPStatusError, ChecksumMismatch) as error:
+                retryable = not isinstance(error, httpx.HTTPStatusError) or error.response.status_code >= 500
+                if attempt + 1 >= attempts or not retryable:
+                    raise
+                time.sleep(min(0.5 * 2 ** attempt, 5.0))
+
+    def download(self, client, url, target, asset):
+        """
+        Stream ``url`` into ``<target>.part``, resuming from its current length
+        with a Range request, then verify and move it into place.
+        """
+        partial = target.with_name(target.name + '.part')
+        target.parent.mkdir(parents=True, exist_ok=True)
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        hasher = hashlib.sha256()
+        with client.stream('GET', url, headers=headers) as response:
+            # 206: the rest of the file follows. 416: nothing is left to fetch,
+            # the partial file may already be complete. Anything else: start over.
+            resuming = bool(offset) and response.status_code in (206, 416)
+            if not resuming:
+                response.raise_for_status()
+            else:
+                with partial.open('rb') as existing:
+                    for chunk in iter(lambda: existing.read(CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+            if response.status_code != 416:
+                with partial.open('ab' if resuming else 'wb') as output:
+                    for chunk in response.iter_bytes(CHUNK_SIZE):
+                        hasher.update(chunk)
+                        output.write(chunk)
+
+        size, digest = partial.stat().st_size, hasher.hexdigest()
+        expected_size, expected_digest = asset.get('size'), asset.get('sha256')
+        if (expected_size is not None and size != expected_size) or (expected_digest and digest != expected_digest):
+            partial.unlink()
+            raise ChecksumMismatch(f'{url} gave {size} bytes with sha256 {digest}, expected {expected_digest}')
+        partial.replace(target)
+        return ('resumed' if resuming else 'downloaded'), size, digest
+
+
+def file_digest(path):
+    hasher = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return path.stat().st_size, hasher.hexdigest()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from CoursePlatform import rollups
+from CoursePlatform.models import EnrollmentRollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly and daily enrollment rollups from the Enrollment table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            choices=[period for period, _ in EnrollmentRollup.PERIOD_CHOICES],
+            action='append',
+            help='Only rebuild this period (repeatable; default: all)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk INSERT')
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(options['period'], batch_size=options['batch_size'])
+        summary = ', '.join(f'{count} {period} rows' for period, count in written.items())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt enrollment rollups: {summary}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from CoursePlatform.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course catalog search index from the Course table'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} courses with {type(backend).__name__}')
+        )
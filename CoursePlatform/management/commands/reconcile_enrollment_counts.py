@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from CoursePlatform.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.students_enrolled from active enrollments in one set-based pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many courses have drifted',
+        )
+
+    def handle(self, *args, **options):
+        active_count = Subquery(
+            Enrollment.objects.filter(course=OuterRef('pk'), status='active')
+            .order_by()
+            .values('course')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        drifted = (
+            Course.objects.annotate(actual=Coalesce(active_count, 0))
+            .exclude(students_enrolled=F('actual'))
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted.count()} courses have drifted enrollment counts')
+            return
+
+        updated = Course.objects.filter(pk__in=drifted.values('pk')).update(
+            students_enrolled=Coalesce(active_count, 0)
+        )
+        self.stdout.write(self.style.SUCCESS(f'Reconciled enrollment counts for {updated} courses'))
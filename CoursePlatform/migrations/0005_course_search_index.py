@@ -0,0 +1,36 @@
+from django.db import migrations
+
+FTS_TABLE = 'courseplatform_course_fts'
+FTS_COLUMNS = ('title', 'short_description', 'instructor', 'category', 'description')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(FTS_COLUMNS)
+    values = ', '.join(f"COALESCE({column}, '')" for column in FTS_COLUMNS)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+        f"SELECT id, {values} FROM CoursePlatform_course"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0004_enrollment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
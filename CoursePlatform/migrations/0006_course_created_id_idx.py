@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0005_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=6),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0007_courserecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='payment_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='payment_id',
+            field=models.CharField(blank=True, help_text='Stripe PaymentIntent id', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='payment_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0009_stripecustomer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-processed_at'],
+            },
+        ),
+    ]
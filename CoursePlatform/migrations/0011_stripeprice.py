@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0010_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.CharField(max_length=255)),
+                ('product_name', models.CharField(max_length=200)),
+                ('price_id', models.CharField(max_length=255)),
+                ('unit_amount', models.PositiveIntegerField(help_text="Price in the currency's smallest unit")),
+                ('currency', models.CharField(default='inr', max_length=3)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stripe_price', to='CoursePlatform.course')),
+            ],
+        ),
+    ]
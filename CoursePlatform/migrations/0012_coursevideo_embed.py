@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0011_stripeprice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='embed_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='video_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=11),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0013_course_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='dropped_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EnrollmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('enrollments', models.IntegerField(default=0)),
+                ('completions', models.IntegerField(default=0)),
+                ('drops', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_rollups', to='CoursePlatform.course')),
+            ],
+            options={
+                'ordering': ['period', 'bucket'],
+                'indexes': [models.Index(fields=['period', 'bucket'], name='rollup_period_bucket_idx'), models.Index(fields=['period', 'category', 'bucket'], name='rollup_category_bucket_idx')],
+                'unique_together': {('period', 'bucket', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0014_enrollment_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='checkout_key',
+            field=models.CharField(blank=True, help_text='Checkout attempt whose Stripe idempotency keys paid for it', max_length=32),
+        ),
+    ]
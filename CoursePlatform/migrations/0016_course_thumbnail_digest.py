@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def copy_digests(apps, schema_editor):
+    Course = apps.get_model('CoursePlatform', 'Course')
+    for course in Course.objects.exclude(thumbnail_variants={}).only('thumbnail_variants'):
+        digest = course.thumbnail_variants.get('digest', '')
+        if digest:
+            Course.objects.filter(pk=course.pk).update(thumbnail_digest=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoursePlatform', '0015_enrollment_checkout_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_digest',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(copy_digests, migrations.RunPython.noop),
+    ]
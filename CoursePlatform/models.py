@@ -1,7 +1,13 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from . import youtube
+
 User = get_user_model()
 
 
@@ -12,6 +18,10 @@ class CourseVideo(models.Model):
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    
+    # Parsed from youtube_url on save, so rendering never parses URLs
+    video_id = models.CharField(max_length=11, blank=True, db_index=True, editable=False)
+    embed_url = models.URLField(max_length=500, blank=True, editable=False)
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -19,18 +29,24 @@ class CourseVideo(models.Model):
     def __str__(self):
         return f"{self.title} - {self.course.title}"
 
+    def save(self, *args, **kwargs):
+        self.refresh_embed()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'youtube_url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'video_id', 'embed_url'}
+        super().save(*args, **kwargs)
+
+    def refresh_embed(self):
+        """Set video_id and embed_url from youtube_url."""
+        video_id, playlist_id = youtube.parse_youtube_url(self.youtube_url)
+        self.video_id = video_id
+        self.embed_url = youtube.embed_url(video_id, playlist_id) or self.youtube_url
+
     def get_embed_url(self):
         """Convert YouTube URL to embed URL"""
-        from urllib.parse import urlparse, parse_qs
-        url_data = urlparse(self.youtube_url)
-        if 'youtube.com' in url_data.netloc:
-            if url_data.path == '/watch':
-                video_id = parse_qs(url_data.query).get('v', [''])[0]
-                return f"https://www.youtube.com/embed/{video_id}"
-        elif 'youtu.be' in url_data.netloc:
-            video_id = url_data.path[1:]
-            return f"https://www.youtube.com/embed/{video_id}"
-        return self.youtube_url
+        if not self.embed_url:
+            self.refresh_embed()
+        return self.embed_url
 
 
 class Course(models.Model):
@@ -71,6 +87,10 @@ class Course(models.Model):
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     thumbnail = models.ImageField(upload_to='course_thumbnails/', null=True, blank=True)
+    # Resized WebP/JPEG renditions of the thumbnail, see CoursePlatform.thumbnails
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Indexed copy of thumbnail_variants["digest"], to find reusable renditions
+    thumbnail_digest = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     promo_video = models.URLField(blank=True, help_text="Link to course promo video (YouTube/Vimeo)")
     
     students_enrolled = models.PositiveIntegerField(default=0)
@@ -84,14 +104,37 @@ class Course(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Courses"
+        indexes = [
+            # Keyset pagination of the catalog pages on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+        ]
+
+    # is_published as last loaded or saved, None when unknown; lets the
+    # published-course counter see a change without re-reading the row
+    _loaded_is_published = None
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'is_published' in field_names:
+            instance._loaded_is_published = instance.is_published
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'is_published' in fields:
+            self._loaded_is_published = self.is_published
         
     def save(self, *args, **kwargs):
         if self.is_published and not self.published_at:
             self.published_at = timezone.now()
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'is_published' in update_fields:
+            self._loaded_is_published = self.is_published
         
     def get_duration_display(self):
         if not self.duration:
@@ -106,12 +149,54 @@ class Course(models.Model):
             return "1 Year"
         return f"{self.duration} Weeks"
         
+    @classmethod
+    def adjust_students_enrolled(cls, course_id, delta, using='default'):
+        """Atomically add ``delta`` to a course's active enrollment counter."""
+        if not delta:
+            return
+        qs = cls._base_manager.using(using).filter(pk=course_id)
+        if delta < 0:
+            qs = qs.filter(students_enrolled__gte=-delta)
+        qs.update(students_enrolled=F('students_enrolled') + delta)
+        
     def get_discount_percentage(self):
         if self.discount_price and self.price:
             return int(((self.price - self.discount_price) / self.price) * 100)
         return 0
 
 
+class EnrollmentQuerySet(models.QuerySet):
+    def release_seats(self, using=None):
+        """
+        Take the active enrollments among these out of their courses'
+        ``students_enrolled``, with one UPDATE across all the courses.
+        """
+        using = using or router.db_for_write(self.model)
+        active = self.filter(status='active').order_by()
+        seats = Subquery(
+            active.filter(course=OuterRef('pk')).values('course').annotate(count=Count('id')).values('count')
+        )
+        Course._base_manager.using(using).filter(pk__in=active.values('course')).update(
+            students_enrolled=Greatest(F('students_enrolled') - seats, 0)
+        )
+
+    def delete(self):
+        """
+        Delete in bulk, releasing the seats with one UPDATE first. Rollups are
+        not retracted row by row here; ``rebuild_enrollment_rollups`` brings
+        them back in line.
+        """
+        from .stats import expire_enrollment_stats
+
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            course_ids = set(self.order_by().values_list('course_id', flat=True))
+            self.release_seats(using)
+            deleted = super().delete()
+        expire_enrollment_stats(course_ids, using=using)
+        return deleted
+
+
 class Enrollment(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
@@ -123,8 +208,18 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
     enrolled_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    dropped_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     
+    payment_status = models.CharField(max_length=20, blank=True)
+    payment_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    payment_id = models.CharField(max_length=255, blank=True, help_text="Stripe PaymentIntent id")
+    checkout_key = models.CharField(
+        max_length=32, blank=True, help_text="Checkout attempt whose Stripe idempotency keys paid for it"
+    )
+    
+    objects = EnrollmentQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student', 'course')
         ordering = ['-enrolled_at']
@@ -133,10 +228,221 @@ class Enrollment(models.Model):
         return f"{self.student.username} - {self.course.title}"
     
     def save(self, *args, **kwargs):
-        if self.status == 'completed' and not self.completed_at:
-            self.completed_at = timezone.now()
-        super().save(*args, **kwargs)
-        
-        # Update course enrollment count
-        self.course.students_enrolled = self.course.enrollments.filter(status='active').count()
-        self.course.save()
+        adding = self._state.adding
+        # Where Model.save() will write: an enrollment read from the replica
+        # is still written to the primary
+        using = kwargs['using'] = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous_status = None
+            if not adding:
+                # Read the stored row under a lock, so concurrent saves of this
+                # enrollment see each other's transition instead of both
+                # applying a delta from the same old status
+                stored = (
+                    type(self)._base_manager.using(using).select_for_update()
+                    .filter(pk=self.pk).values_list('status', 'completed_at', 'dropped_at').first()
+                )
+                if stored is not None:
+                    previous_status, completed_at, dropped_at = stored
+                    self.completed_at = self.completed_at or completed_at
+                    self.dropped_at = self.dropped_at or dropped_at
+
+            completing = self.status == 'completed' and not self.completed_at
+            dropping = self.status == 'dropped' and not self.dropped_at
+            if completing:
+                self.completed_at = timezone.now()
+            if dropping:
+                self.dropped_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and (completing or dropping):
+                kwargs['update_fields'] = {*update_fields, 'completed_at', 'dropped_at'}
+
+            super().save(*args, **kwargs)
+            # Apply the change in active enrollments as a delta on the course row
+            delta = (self.status == 'active') - (previous_status == 'active')
+            Course.adjust_students_enrolled(self.course_id, delta, using=using)
+            EnrollmentRollup.record(
+                self,
+                enrolled=adding,
+                completed=completing,
+                dropped=dropping,
+                using=using,
+            )
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Unenroll: release the seat and take the enrollment back out of the
+        rollups. Cascades and bulk deletes skip this (see EnrollmentQuerySet).
+        """
+        from .stats import expire_enrollment_stats
+
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            if self.status == 'active':
+                Course.adjust_students_enrolled(self.course_id, -1, using=using)
+            EnrollmentRollup.retract(self, using=using)
+        expire_enrollment_stats([self.course_id], using=using)
+        return deleted
+
+
+class EnrollmentRollup(models.Model):
+    """
+    Enrollment activity of one course in one hour or day, kept up to date by
+    ``Enrollment.save()`` and rebuilt by ``rebuild_enrollment_rollups``.
+
+    Enrollments and revenue count at ``enrolled_at``, completions at
+    ``completed_at`` and drops at ``dropped_at``; buckets start on the hour or
+    midnight in the current time zone. ``category`` is copied from the course
+    so per-category series don't join the course table.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    COUNTERS = ('enrollments', 'completions', 'drops', 'revenue')
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollment_rollups')
+    category = models.CharField(max_length=100, blank=True)
+    enrollments = models.IntegerField(default=0)
+    completions = models.IntegerField(default=0)
+    drops = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'bucket']
+        unique_together = ('period', 'bucket', 'course')
+        indexes = [
+            models.Index(fields=['period', 'bucket'], name='rollup_period_bucket_idx'),
+            models.Index(fields=['period', 'category', 'bucket'], name='rollup_category_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} {self.period} {self.bucket:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def bucket_start(cls, value, period):
+        value = timezone.localtime(value)
+        value = value.replace(minute=0, second=0, microsecond=0)
+        return value.replace(hour=0) if period == cls.DAY else value
+
+    @classmethod
+    def add(cls, course_id, category, when, using='default', create=True, **deltas):
+        """
+        Add ``deltas`` (e.g. ``enrollments=1``) to the hour and day rows of
+        ``course_id`` containing ``when``, creating them unless ``create`` is
+        false.
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        changes = {field: F(field) + value for field, value in deltas.items()}
+        manager = cls._base_manager.using(using)
+        for period, _ in cls.PERIOD_CHOICES:
+            bucket = cls.bucket_start(when, period)
+            rows = manager.filter(period=period, bucket=bucket, course_id=course_id)
+            if rows.update(**changes) or not create:
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    manager.create(period=period, bucket=bucket, course_id=course_id, category=category, **deltas)
+            except IntegrityError:
+                # Created concurrently: add to that row instead
+                rows.update(**changes)
+
+    @staticmethod
+    def revenue_of(enrollment):
+        if enrollment.payment_status != 'completed' or not enrollment.payment_amount:
+            return Decimal(0)
+        return Decimal(str(enrollment.payment_amount)).quantize(Decimal('0.01'))
+
+    @classmethod
+    def record(cls, enrollment, enrolled=False, completed=False, dropped=False, using='default'):
+        """Count the events of one ``Enrollment.save()``."""
+        if not (enrolled or completed or dropped):
+            return
+        course_id = enrollment.course_id
+        category = enrollment.course.category if enrollment.course_id else ''
+        if enrolled:
+            cls.add(course_id, category, enrollment.enrolled_at, using=using,
+                    enrollments=1, revenue=cls.revenue_of(enrollment))
+        if completed:
+            cls.add(course_id, category, enrollment.completed_at, using=using, completions=1)
+        if dropped:
+            cls.add(course_id, category, enrollment.dropped_at, using=using, drops=1)
+
+    @classmethod
+    def retract(cls, enrollment, using='default'):
+        """Take a deleted enrollment's events back out of the rollups."""
+        kwargs = {'using': using, 'create': False}
+        cls.add(enrollment.course_id, '', enrollment.enrolled_at, **kwargs,
+                enrollments=-1, revenue=-cls.revenue_of(enrollment))
+        if enrollment.completed_at:
+            cls.add(enrollment.course_id, '', enrollment.completed_at, **kwargs, completions=-1)
+        if enrollment.dropped_at:
+            cls.add(enrollment.course_id, '', enrollment.dropped_at, **kwargs, drops=-1)
+
+
+class CourseRecommendation(models.Model):
+    """Precomputed "similar courses" row, rebuilt by ``build_recommendations``."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    built_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['course', 'rank']
+        unique_together = [('course', 'rank'), ('course', 'recommended')]
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} (#{self.rank})"
+
+
+class StripeCustomer(models.Model):
+    """Stripe customer belonging to a user, reused for every later purchase."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stripe_customer')
+    customer_id = models.CharField(max_length=255, unique=True)
+    default_payment_method = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.customer_id}"
+
+
+class StripeEvent(models.Model):
+    """
+    Stripe webhook event that has been handled. The unique event id is the
+    idempotency key: a redelivered event finds its row and is skipped.
+    """
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-processed_at']
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+class StripePrice(models.Model):
+    """
+    Stripe Product and Price mirroring a course, created lazily at checkout
+    and re-synced only when the course title or effective price changes.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='stripe_price')
+    product_id = models.CharField(max_length=255)
+    product_name = models.CharField(max_length=200)
+    price_id = models.CharField(max_length=255)
+    unit_amount = models.PositiveIntegerField(help_text="Price in the currency's smallest unit")
+    currency = models.CharField(max_length=3, default='inr')
+    synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.course_id} - {self.price_id}"
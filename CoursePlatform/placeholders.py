@@ -0,0 +1,123 @@
+"""
+Placeholder card images for courses without a thumbnail.
+
+Each (level, category) pair gets a deterministic image: a gradient whose hue
+comes from the category and whose tone comes from the level, with the
+category name on it. It is rendered once with Pillow, kept in storage, and
+served from a versioned URL with a one-year immutable cache lifetime, so
+browsers fetch each placeholder once. Only slugs of categories in use (and
+the generic one) are rendered; anything else is a 404.
+"""
+import colorsys
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.text import slugify
+
+# Part of the URL and storage path: bump when the artwork changes
+VERSION = "v1"
+
+WIDTH, HEIGHT = 600, 400
+
+# (saturation, lightness) of the gradient per level
+LEVEL_TONES = {
+    "beginner": (0.55, 0.55),
+    "intermediate": (0.60, 0.45),
+    "advanced": (0.65, 0.35),
+}
+
+DEFAULT_SLUG = "general"
+
+
+def placeholder_slug(category):
+    return slugify(category or "")[:50].strip("-") or DEFAULT_SLUG
+
+
+def placeholder_url(level, category):
+    level = (level or "").lower()
+    if level not in LEVEL_TONES:
+        level = "beginner"
+    return reverse("courseplatform:placeholder", kwargs={
+        "version": VERSION, "level": level, "slug": placeholder_slug(category),
+    })
+
+
+def storage_name(level, slug):
+    return f"placeholders/{VERSION}/{level}/{slug}.webp"
+
+
+def _rgb(hue, saturation, lightness):
+    return tuple(round(channel * 255) for channel in colorsys.hls_to_rgb(hue, lightness, saturation))
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow built without FreeType only has the small bitmap font
+        return ImageFont.load_default()
+
+
+def render_placeholder(level, slug):
+    """Return the WebP bytes of the placeholder for ``level`` and ``slug``."""
+    from PIL import Image, ImageChops, ImageDraw
+
+    saturation, lightness = LEVEL_TONES[level]
+    hue = int(hashlib.sha256(slug.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    start = _rgb(hue, saturation, lightness)
+    end = _rgb((hue + 0.12) % 1.0, saturation, max(lightness - 0.15, 0.1))
+
+    # Diagonal gradient: blend two solid images through the average of a
+    # horizontal and a vertical linear mask
+    vertical = Image.linear_gradient("L").resize((WIDTH, HEIGHT))
+    horizontal = Image.linear_gradient("L").rotate(90).resize((WIDTH, HEIGHT))
+    mask = ImageChops.add(vertical, horizontal, scale=2)
+    image = Image.composite(Image.new("RGB", (WIDTH, HEIGHT), end), Image.new("RGB", (WIDTH, HEIGHT), start), mask)
+
+    draw = ImageDraw.Draw(image)
+    label = slug.replace("-", " ").title() if slug != DEFAULT_SLUG else "Course"
+    font = _font(44)
+    left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+    position = ((WIDTH - (right - left)) / 2, (HEIGHT - (bottom - top)) / 2 - top)
+    draw.text(position, label, fill=(255, 255, 255), font=font)
+    subtitle_font = _font(20)
+    subtitle = level.title()
+    left, _, right, _ = draw.textbbox((0, 0), subtitle, font=subtitle_font)
+    draw.text(((WIDTH - (right - left)) / 2, position[1] + (bottom - top) + 24), subtitle,
+              fill=(255, 255, 255), font=subtitle_font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=80, method=6)
+    return buffer.getvalue()
+
+
+def is_known_slug(slug):
+    """Whether ``slug`` is the placeholder slug of a category in use."""
+    from .models import Course
+
+    if slug == DEFAULT_SLUG:
+        return True
+    categories = Course.objects.exclude(category="").values_list("category", flat=True).distinct()
+    return any(placeholder_slug(category) == slug for category in categories)
+
+
+def get_placeholder(level, slug):
+    """
+    Storage name of the placeholder, rendering it on first use. Returns None
+    for a slug no course category maps to, so arbitrary URLs don't fill the
+    storage with images.
+    """
+    name = storage_name(level, slug)
+    if not default_storage.exists(name):
+        if not is_known_slug(slug):
+            return None
+        saved = default_storage.save(name, ContentFile(render_placeholder(level, slug)))
+        if saved != name:
+            # Rendered concurrently by another request; keep the first copy
+            default_storage.delete(saved)
+    return name
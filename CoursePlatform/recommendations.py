@@ -0,0 +1,158 @@
+"""
+Offline "similar courses" builder.
+
+Scores every pair of courses that share learners by the cosine similarity of
+their enrollment sets, adds a bonus for a shared category and for nearby
+levels, and stores the top N published neighbours of each course in
+``CourseRecommendation``. Courses nobody co-enrolls in still get neighbours
+from the most popular courses of their category.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Count
+
+from .models import Course, CourseRecommendation, Enrollment
+
+LEVEL_RANK = {"BEGINNER": 0, "INTERMEDIATE": 1, "ADVANCED": 2}
+
+
+def level_similarity(a, b):
+    a, b = LEVEL_RANK.get((a or "").upper()), LEVEL_RANK.get((b or "").upper())
+    if a is None or b is None:
+        return 0.0
+    return 1.0 - abs(a - b) / 2
+
+
+def co_enrollment_pairs(using):
+    """Yield ``(course_a, course_b, shared_learners)`` with ``course_a < course_b``."""
+    table = Enrollment._meta.db_table
+    sql = (
+        f"SELECT a.course_id, b.course_id, COUNT(*) FROM {table} a "
+        f"JOIN {table} b ON a.student_id = b.student_id AND a.course_id < b.course_id "
+        f"WHERE a.status != %s AND b.status != %s "
+        f"GROUP BY a.course_id, b.course_id"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, ["dropped", "dropped"])
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            yield from rows
+
+
+class _TopN:
+    """Keeps the ``n`` best-scoring candidates per course."""
+
+    def __init__(self, n):
+        self.n = n
+        self.heaps = defaultdict(list)
+        self.members = defaultdict(dict)
+
+    def offer(self, course_id, candidate_id, score):
+        members = self.members[course_id]
+        if members.get(candidate_id, -1) >= score:
+            return
+        heap = self.heaps[course_id]
+        if candidate_id in members:
+            # Rare: a better score for a candidate already held. Rebuild the heap.
+            heap[:] = [(s, c) for s, c in heap if c != candidate_id]
+            heapq.heapify(heap)
+        elif len(heap) >= self.n:
+            if heap[0][0] >= score:
+                return
+            _, evicted = heapq.heappop(heap)
+            del members[evicted]
+        heapq.heappush(heap, (score, candidate_id))
+        members[candidate_id] = score
+
+    def ranked(self, course_id):
+        return sorted(self.heaps.get(course_id, []), key=lambda item: (-item[0], item[1]))
+
+
+def build_recommendations(top_n=4, co_weight=1.0, category_weight=0.3, level_weight=0.1):
+    """Recompute the recommendation table. Returns the number of rows written."""
+    using = router.db_for_write(CourseRecommendation)
+    courses = {
+        pk: (category.strip().lower(), level, is_published)
+        for pk, category, level, is_published in Course.objects.using(using).values_list(
+            "id", "category", "level", "is_published"
+        )
+    }
+    learners = dict(
+        Enrollment.objects.using(using)
+        .exclude(status="dropped")
+        .order_by()
+        .values_list("course")
+        .annotate(count=Count("id"))
+    )
+
+    def metadata_score(a, b):
+        category_a, level_a, _ = courses[a]
+        category_b, level_b, _ = courses[b]
+        score = level_weight * level_similarity(level_a, level_b)
+        if category_a and category_a == category_b:
+            score += category_weight
+        return score
+
+    top = _TopN(top_n)
+    for a, b, shared in co_enrollment_pairs(using):
+        if a not in courses or b not in courses:
+            continue
+        similarity = co_weight * shared / math.sqrt(learners.get(a, 1) * learners.get(b, 1))
+        score = similarity + metadata_score(a, b)
+        if courses[b][2]:
+            top.offer(a, b, score)
+        if courses[a][2]:
+            top.offer(b, a, score)
+
+    # Cold start: the most popular published courses of each category
+    popular = defaultdict(list)
+    for pk in sorted(courses, key=lambda pk: -learners.get(pk, 0)):
+        category, _, is_published = courses[pk]
+        if category and is_published and len(popular[category]) <= top_n:
+            popular[category].append(pk)
+    for pk, (category, _, _) in courses.items():
+        for candidate in popular.get(category, ()):
+            if candidate != pk:
+                top.offer(pk, candidate, metadata_score(pk, candidate))
+
+    rows = (
+        CourseRecommendation(course_id=pk, recommended_id=candidate, rank=rank, score=score)
+        for pk in courses
+        for rank, (score, candidate) in enumerate(top.ranked(pk), start=1)
+    )
+    written = 0
+    with transaction.atomic(using=using):
+        CourseRecommendation.objects.using(using).all().delete()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= 1000:
+                CourseRecommendation.objects.using(using).bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            CourseRecommendation.objects.using(using).bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def get_similar_courses(course, limit=4):
+    """
+    The stored neighbours of ``course``, or published courses of its category
+    while none are stored (a course added since the last build, or no build).
+    """
+    similar = list(
+        Course.objects.filter(recommended_for__course=course, is_published=True)
+        .order_by("recommended_for__rank")[:limit]
+    )
+    if not similar:
+        similar = list(
+            Course.objects.filter(category=course.category, is_published=True)
+            .exclude(pk=course.pk)[:limit]
+        )
+    return similar
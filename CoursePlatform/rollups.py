@@ -0,0 +1,115 @@
+"""
+Enrollment time series.
+
+``EnrollmentRollup`` rows hold per-course hourly and daily counts of
+enrollments, completions and drops plus revenue. ``Enrollment.save()`` and
+the delete signal keep them current; ``rebuild`` recomputes them from the
+enrollment table (``rebuild_enrollment_rollups``), and ``series`` reads them
+for the dashboard charts.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import Enrollment, EnrollmentRollup
+
+TRUNCATE = {
+    EnrollmentRollup.HOUR: TruncHour,
+    EnrollmentRollup.DAY: TruncDay,
+}
+
+# Event -> (timestamp field, aggregates)
+EVENTS = {
+    'enrolled_at': {
+        'enrollments': Count('id'),
+        'revenue': Sum('payment_amount', filter=Q(payment_status='completed')),
+    },
+    'completed_at': {'completions': Count('id')},
+    'dropped_at': {'drops': Count('id')},
+}
+
+GROUPS = ('total', 'category', 'course')
+
+
+def compute(period):
+    """
+    Aggregate the enrollment table into ``{(bucket, course_id): row}`` for
+    one period, with one grouped query per event type.
+    """
+    truncate = TRUNCATE[period]
+    rows = {}
+    for field, aggregates in EVENTS.items():
+        grouped = (
+            Enrollment.objects.filter(**{f'{field}__isnull': False})
+            .order_by()
+            .values('course_id', bucket=truncate(field), category=F('course__category'))
+            .annotate(**aggregates)
+        )
+        for values in grouped.iterator():
+            key = (values['bucket'], values['course_id'])
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = EnrollmentRollup(
+                    period=period, bucket=values['bucket'], course_id=values['course_id'],
+                    category=values['category'] or '',
+                )
+            for name in aggregates:
+                setattr(row, name, values[name] or 0)
+    return rows
+
+
+def rebuild(periods=None, batch_size=1000):
+    """Replace the rollups of ``periods`` (default: all) with freshly computed ones."""
+    periods = periods or list(TRUNCATE)
+    written = {}
+    for period in periods:
+        rows = compute(period)
+        with transaction.atomic():
+            EnrollmentRollup.objects.filter(period=period).delete()
+            EnrollmentRollup.objects.bulk_create(rows.values(), batch_size=batch_size)
+        written[period] = len(rows)
+    return written
+
+
+def series(period, start, end=None, group='total', course_ids=None, category=None):
+    """
+    Sparse time series between ``start`` and ``end``: a list of
+    ``{'key', 'points': [{'bucket', 'enrollments', 'completions', 'drops', 'revenue'}]}``,
+    one per course, per category or a single ``'total'`` series.
+    """
+    rollups = EnrollmentRollup.objects.filter(period=period, bucket__gte=start)
+    if end is not None:
+        rollups = rollups.filter(bucket__lt=end)
+    if course_ids:
+        rollups = rollups.filter(course_id__in=course_ids)
+    if category:
+        rollups = rollups.filter(category=category)
+
+    keys = {'total': [], 'category': ['category'], 'course': ['course_id']}[group]
+    rows = (
+        rollups.order_by()
+        .values('bucket', *keys)
+        .annotate(
+            enrollments_sum=Sum('enrollments'),
+            completions_sum=Sum('completions'),
+            drops_sum=Sum('drops'),
+            revenue_sum=Sum('revenue'),
+        )
+        .order_by(*keys, 'bucket')
+    )
+
+    points = defaultdict(list)
+    for row in rows:
+        key = row[keys[0]] if keys else 'total'
+        points[key].append({
+            'bucket': timezone.localtime(row['bucket']).isoformat(),
+            'enrollments': row['enrollments_sum'],
+            'completions': row['completions_sum'],
+            'drops': row['drops_sum'],
+            'revenue': str(Decimal(row['revenue_sum'] or 0).quantize(Decimal('0.01'))),
+        })
+    return [{'key': key, 'points': values} for key, values in points.items()]
@@ -0,0 +1,196 @@
+"""
+Full-text search for the course catalog.
+
+Search goes through a pluggable backend chosen by the ``COURSE_SEARCH_BACKEND``
+setting (a dotted path). ``SQLiteFTSSearchBackend`` keeps an FTS5 shadow table
+in sync with ``Course`` and ranks matches with bm25; ``SimpleSearchBackend``
+works on any database using ``icontains`` lookups.
+
+The catalog pages through matches with ``rank``, which leaves the ranking to
+the database as a ``search_rank`` annotation, so keyset pagination on
+``(search_rank, id)`` reaches every match rather than a truncated top N.
+"""
+import abc
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = "CoursePlatform.search.SimpleSearchBackend"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query):
+    """Split a free-text query into lowercase search terms."""
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend(abc.ABC):
+    """Interface every course search backend implements."""
+
+    @abc.abstractmethod
+    def search(self, query, limit=None, filters=None):
+        """
+        Return course ids matching ``query``, most relevant first. ``filters``
+        are ``Course`` lookups applied before ``limit``, so a narrow filter
+        never loses matches to better-ranked courses it excludes.
+        """
+
+    @abc.abstractmethod
+    def rank(self, queryset, query):
+        """
+        Narrow the ``Course`` ``queryset`` to matches of ``query`` and
+        annotate them with ``search_rank``, lowest for the most relevant.
+        """
+
+    def index(self, course):
+        """Add or refresh ``course`` in the index."""
+
+    def remove(self, course_id, using=None):
+        """Drop ``course_id`` from the index."""
+
+    def rebuild(self):
+        """Re-index every course. Returns the number of indexed rows."""
+        return 0
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Database-agnostic fallback using ``icontains`` filters.
+
+    Title matches rank above instructor/category matches, which rank above
+    description-only matches.
+    """
+
+    def search(self, query, limit=None, filters=None):
+        from .models import Course
+
+        qs = self.rank(Course.objects.filter(**(filters or {})), query)
+        ids = qs.order_by("search_rank", "-created_at", "-id").values_list("id", flat=True)
+        return list(ids[:limit] if limit else ids)
+
+    def rank(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none().annotate(search_rank=Value(0))
+
+        score = Value(0)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) |
+                Q(instructor__icontains=term) |
+                Q(category__icontains=term) |
+                Q(description__icontains=term)
+            )
+            score = score + Case(
+                When(title__icontains=term, then=Value(4)),
+                When(Q(instructor__icontains=term) | Q(category__icontains=term), then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        return queryset.annotate(search_rank=-score)
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index over the searchable ``Course`` columns.
+
+    The shadow table is created by migration ``0005`` and keyed by the course
+    id (its ``rowid``). Terms are matched as prefixes so partial words typed
+    into the search box still hit, and results are ordered by bm25 with the
+    title weighted highest.
+    """
+
+    table = "courseplatform_course_fts"
+    columns = ("title", "short_description", "instructor", "category", "description")
+    weights = (10.0, 5.0, 4.0, 4.0, 1.0)
+
+    def build_match(self, query):
+        terms = tokenize(query)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit=None, filters=None):
+        from .models import Course
+
+        match = self.build_match(query)
+        if not match:
+            return []
+
+        weights = ", ".join(str(w) for w in self.weights)
+        sql = f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s"
+        params = [match]
+        if filters:
+            subquery, subquery_params = Course.objects.filter(**filters).values("id").query.sql_with_params()
+            sql += f" AND rowid IN ({subquery})"
+            params.extend(subquery_params)
+        sql += f" ORDER BY bm25({self.table}, {weights})"
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+
+        with connections[router.db_for_read(Course)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def rank(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none().annotate(search_rank=Value(0.0))
+
+        weights = ", ".join(str(w) for w in self.weights)
+        opts, quote = queryset.model._meta, connections[queryset.db].ops.quote_name
+        course_id = f"{quote(opts.db_table)}.{quote(opts.pk.column)}"
+        # bm25() is only defined inside a MATCH query, so each row's score is
+        # a MATCH narrowed to that rowid (an index seek, not a scan)
+        score = RawSQL(
+            f"SELECT bm25({self.table}, {weights}) FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND rowid = {course_id}",
+            [match],
+            output_field=FloatField(),
+        )
+        matches = RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [match])
+        return queryset.filter(pk__in=matches).annotate(search_rank=score)
+
+    def index(self, course):
+        values = [getattr(course, column) or "" for column in self.columns]
+        with connections[router.db_for_write(type(course), instance=course)].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [course.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(self.columns))})",
+                [course.pk, *values],
+            )
+
+    def remove(self, course_id, using=None):
+        from .models import Course
+
+        with connections[using or router.db_for_write(Course)].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [course_id])
+
+    def rebuild(self):
+        from .models import Course
+
+        columns = ", ".join(self.columns)
+        values = ", ".join(f"COALESCE({column}, '')" for column in self.columns)
+        with connections[router.db_for_write(Course)].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {columns}) "
+                f"SELECT id, {values} FROM {Course._meta.db_table}"
+            )
+            return cursor.rowcount
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    """Return the configured search backend instance."""
+    return _load_backend(getattr(settings, "COURSE_SEARCH_BACKEND", DEFAULT_BACKEND))
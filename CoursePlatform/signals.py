@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import catalog_cache
+from .models import Course, Enrollment, EnrollmentRollup, StripeCustomer
+from .search import get_search_backend
+from .stats import expire_enrollment_stats
+from .stripe_utils import customer_cache_key
+from .thumbnails import schedule_thumbnail
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    """Keep the catalog search index in step with the saved course."""
+    if not raw:
+        get_search_backend().index(instance)
+
+
+@receiver(post_save, sender=Course)
+def render_thumbnail_variants(sender, instance, raw=False, using=None, **kwargs):
+    """Queue resized variants when the thumbnail is new or has changed."""
+    if raw or not instance.thumbnail:
+        return
+    if instance.thumbnail_variants.get('source') != instance.thumbnail.name:
+        schedule_thumbnail(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, using=None, **kwargs):
+    get_search_backend().remove(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def expire_catalog_pages(sender, using=None, **kwargs):
+    # Bump now so this transaction stops seeing old pages, and again after
+    # commit so pages cached by concurrent readers meanwhile are dropped too
+    catalog_cache.bump_generation()
+    transaction.on_commit(catalog_cache.bump_generation, using=using)
+
+
+# Enrollment has no delete receivers on purpose: any would make every
+# cascade from Course or User load and signal each enrollment instead of
+# issuing one DELETE. Enrollment.delete() and EnrollmentQuerySet.delete()
+# keep the derived state instead.
+
+@receiver(post_save, sender=Enrollment)
+def expire_course_enrollment_stats(sender, instance, using=None, **kwargs):
+    expire_enrollment_stats([instance.course_id], using=using)
+
+
+@receiver(post_delete, sender=Course)
+def expire_deleted_course_stats(sender, instance, using=None, **kwargs):
+    expire_enrollment_stats([instance.pk], using=using)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def release_user_enrollments(sender, instance, using=None, **kwargs):
+    """A user's enrollments go by cascade in one DELETE: release their seats first."""
+    enrollments = Enrollment.objects.filter(student=instance)
+    course_ids = list(enrollments.values_list('course_id', flat=True))
+    if course_ids:
+        enrollments.release_seats(using)
+        expire_enrollment_stats(course_ids, using=using)
+
+
+@receiver(post_save, sender=StripeCustomer)
+@receiver(post_delete, sender=StripeCustomer)
+def expire_stripe_customer(sender, instance, **kwargs):
+    cache.delete(customer_cache_key(instance.user_id))
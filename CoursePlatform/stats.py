@@ -0,0 +1,46 @@
+"""
+Per-course enrollment statistics.
+
+``get_enrollment_stats`` answers with one grouped aggregate over the course's
+enrollments and caches the result until an ``Enrollment`` for that course is
+saved (see ``signals.py``) or deleted (see ``Enrollment.delete``).
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Enrollment
+
+STATS_CACHE_TIMEOUT = 60 * 60
+
+
+def stats_cache_key(course_id):
+    return f"courseplatform:enrollment-stats:{course_id}"
+
+
+def get_enrollment_stats(course_id):
+    """Return ``{'total', 'active', 'completed', 'dropped'}`` counts for a course."""
+    key = stats_cache_key(course_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = {status: 0 for status, _ in Enrollment.STATUS_CHOICES}
+        rows = (
+            Enrollment.objects.filter(course_id=course_id)
+            .order_by()
+            .values_list('status')
+            .annotate(count=Count('id'))
+        )
+        for status, count in rows:
+            stats[status] = count
+        stats['total'] = sum(stats.values())
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def expire_enrollment_stats(course_ids, using='default'):
+    """Expire now and again after commit, so a concurrent reader can't re-cache old counts."""
+    keys = [stats_cache_key(course_id) for course_id in course_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
@@ -1,6 +1,22 @@
+import asyncio
+import ssl
+import threading
+import time
+import uuid
+from decimal import Decimal
+from functools import wraps
+
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+
+from .models import StripeCustomer, StripePrice
+
+CUSTOMER_CACHE_TIMEOUT = 60 * 60 * 24
 
 def initialize_stripe():
     """Initialize Stripe with API key from settings."""
@@ -8,8 +24,17 @@ def initialize_stripe():
         raise ImproperlyConfigured("STRIPE_SECRET_KEY is not set in Django settings")
     
     stripe.api_key = settings.STRIPE_SECRET_KEY
+    if getattr(settings, 'STRIPE_API_BASE', None):
+        stripe.api_base = settings.STRIPE_API_BASE
     return stripe
 
+def checkout_customer_params(user):
+    """Checkout Session kwargs: the stored customer if we have one, else the email."""
+    record = get_customer(user.pk)
+    if record is not None:
+        return {'customer': record[0]}
+    return {'customer_email': user.email}
+
 def create_checkout_session(course, user, request):
     """Create a Stripe checkout session."""
     try:
@@ -18,13 +43,7 @@ def create_checkout_session(course, user, request):
         return stripe.checkout.Session.create(
             payment_method_types=['card'],
             line_items=[{
-                'price_data': {
-                    'currency': 'inr',
-                    'product_data': {
-                        'name': course.title,
-                    },
-                    'unit_amount': int(course.price * 100),  # Convert to paise
-                },
+                'price': ensure_stripe_price(course),
                 'quantity': 1,
             }],
             mode='payment',
@@ -35,11 +54,390 @@ def create_checkout_session(course, user, request):
                 f'/course/payment/cancelled/{course.pk}/'
             ),
             client_reference_id=str(user.id),
-            customer_email=user.email,
+            **checkout_customer_params(user),
         )
     except stripe.error.StripeError as e:
         print(f"Stripe Error: {str(e)}")
         raise
     except Exception as e:
         print(f"Error creating checkout session: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+# --- Checkout attempts -------------------------------------------------------
+#
+# Each checkout attempt gets its own key, from which the idempotency keys of
+# its Stripe calls are derived. Retries within the attempt replay safely, while
+# a new attempt (after a decline, or buying again after unenrolling) reaches
+# Stripe instead of getting the earlier attempt's stored response.
+
+def new_checkout_key():
+    return uuid.uuid4().hex
+
+
+# --- Customers --------------------------------------------------------------
+#
+# Each user gets one Stripe customer, stored in StripeCustomer and read
+# through the cache, so repeat buyers never pay for Customer.create again.
+
+def customer_cache_key(user_id):
+    return f"courseplatform:stripe-customer:{user_id}"
+
+
+def get_customer(user_id):
+    """Return ``(customer_id, default_payment_method)`` for a user, or None."""
+    key = customer_cache_key(user_id)
+    record = cache.get(key)
+    if record is None:
+        record = (
+            StripeCustomer.objects.filter(user_id=user_id)
+            .values_list('customer_id', 'default_payment_method')
+            .first()
+        )
+        if record is not None:
+            cache.set(key, record, CUSTOMER_CACHE_TIMEOUT)
+    return record
+
+
+def _store_customer(user, customer_id, payment_method_id):
+    try:
+        StripeCustomer.objects.create(
+            user=user, customer_id=customer_id, default_payment_method=payment_method_id
+        )
+    except IntegrityError:
+        # A concurrent checkout for the same user stored it first
+        customer_id, payment_method_id = StripeCustomer.objects.filter(user=user).values_list(
+            'customer_id', 'default_payment_method'
+        ).get()
+    return customer_id, payment_method_id
+
+
+def _remember_payment_method(user, customer_id, payment_method_id):
+    StripeCustomer.objects.filter(user=user).update(default_payment_method=payment_method_id)
+    cache.set(customer_cache_key(user.pk), (customer_id, payment_method_id), CUSTOMER_CACHE_TIMEOUT)
+
+
+def get_or_create_customer(user, payment_method_id, checkout_key):
+    """
+    Return the user's Stripe customer id, creating the customer on first
+    purchase. A new card is attached to the existing customer instead.
+    """
+    initialize_stripe()
+    record = get_customer(user.pk)
+    if record is None:
+        customer = stripe.Customer.create(
+            payment_method=payment_method_id,
+            email=user.email,
+            invoice_settings={'default_payment_method': payment_method_id},
+            idempotency_key=f'customer-{checkout_key}',
+        )
+        record = _store_customer(user, customer.id, payment_method_id)
+        cache.set(customer_cache_key(user.pk), record, CUSTOMER_CACHE_TIMEOUT)
+    customer_id, default_payment_method = record
+    if payment_method_id and payment_method_id != default_payment_method:
+        # A saved card may already be attached; attaching it again is an error
+        payment_method = stripe.PaymentMethod.retrieve(payment_method_id)
+        if payment_method.customer != customer_id:
+            stripe.PaymentMethod.attach(
+                payment_method_id, customer=customer_id, idempotency_key=f'attach-{checkout_key}'
+            )
+        _remember_payment_method(user, customer_id, payment_method_id)
+    return customer_id
+
+
+# --- Prices -----------------------------------------------------------------
+#
+# Checkout references a Product and Price kept per course in StripePrice
+# instead of sending inline price_data, which made Stripe create a new
+# throwaway price for every session.
+
+CURRENCY = 'inr'
+
+
+def unit_amount(course):
+    """The course's effective price in paise."""
+    price = course.discount_price if course.discount_price else course.price
+    return int(Decimal(price) * 100)
+
+
+def _create_product(course):
+    return stripe.Product.create(
+        name=course.title,
+        description=course.short_description or course.description[:200] or None,
+        metadata={'course_id': course.pk},
+        idempotency_key=f'product-{course.pk}',
+    )
+
+
+def _create_price(course, product_id, amount, previous_price_id=None):
+    # The key names the price being replaced, so going back to an earlier
+    # amount (A -> B -> A) makes a new price instead of replaying the first,
+    # since archived, one
+    return stripe.Price.create(
+        product=product_id,
+        unit_amount=amount,
+        currency=CURRENCY,
+        metadata={'course_id': course.pk},
+        idempotency_key=f'price-{course.pk}-{product_id}-{amount}-{previous_price_id or "new"}',
+    )
+
+
+def ensure_stripe_price(course):
+    """
+    Return the Stripe price id for ``course``, creating its Product and Price
+    on first use. A title change renames the product; an amount change
+    creates a new Price (prices are immutable) and archives the old one.
+    Otherwise no Stripe call is made.
+    """
+    amount = unit_amount(course)
+    record = StripePrice.objects.filter(course=course).first()
+    if record is not None and record.unit_amount == amount and record.product_name == course.title:
+        return record.price_id
+
+    initialize_stripe()
+    if record is None:
+        product = _create_product(course)
+        price = _create_price(course, product.id, amount)
+        try:
+            StripePrice.objects.create(
+                course=course,
+                product_id=product.id,
+                product_name=course.title,
+                price_id=price.id,
+                unit_amount=amount,
+                currency=CURRENCY,
+            )
+        except IntegrityError:
+            # A concurrent checkout for the same course stored it first
+            return StripePrice.objects.values_list('price_id', flat=True).get(course=course)
+        return price.id
+
+    if record.product_name != course.title:
+        stripe.Product.modify(record.product_id, name=course.title)
+        record.product_name = course.title
+    if record.unit_amount != amount:
+        old_price_id = record.price_id
+        record.price_id = _create_price(course, record.product_id, amount, old_price_id).id
+        record.unit_amount = amount
+        stripe.Price.modify(old_price_id, active=False)
+    record.save()
+    return record.price_id
+
+
+# --- Async client -----------------------------------------------------------
+#
+# The async payment path talks to Stripe through a StripeClient backed by a
+# pooled httpx.AsyncClient with explicit timeouts. Retries are done here
+# rather than inside stripe-python so they can be capped by a RetryBudget:
+# when Stripe is degraded, retries stop multiplying the load we send it.
+
+class RetryBudget:
+    """
+    Allow retries up to ``ratio`` of recent requests, plus a small
+    ``min_per_second`` allowance so low-traffic sites can still retry.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_balance=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._balance = max_balance
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount=0.0):
+        now = time.monotonic()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self._balance = min(self.max_balance, self._balance + amount)
+
+    def record_request(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def can_retry(self):
+        with self._lock:
+            self._refill()
+            if self._balance >= 1.0:
+                self._balance -= 1.0
+                return True
+            return False
+
+
+class PooledHTTPXClient(stripe.HTTPClient):
+    """
+    Async-only HTTP client for StripeClient: one httpx.AsyncClient with a
+    bounded keep-alive pool, which stripe.HTTPXClient has no setting for.
+    Built on the public HTTPClient interface, so the pool is created once and
+    no stripe-python internals are replaced.
+    """
+
+    name = 'httpx-pooled'
+
+    def __init__(self, max_connections=20, timeout=80, **kwargs):
+        super().__init__(**kwargs)
+        import httpx
+
+        proxy = (self._proxy or {}).get('https')
+        self._client = httpx.AsyncClient(
+            verify=ssl.create_default_context(cafile=stripe.ca_bundle_path) if self._verify_ssl_certs else False,
+            timeout=timeout,
+            proxy=proxy,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def request_async(self, method, url, headers, post_data=None):
+        try:
+            response = await self._client.request(method, url, headers=headers, content=post_data)
+        except Exception as error:
+            raise stripe.APIConnectionError(
+                f'Unexpected error communicating with Stripe ({type(error).__name__})', should_retry=True
+            ) from error
+        return response.content, response.status_code, response.headers
+
+    def sleep_async(self, secs):
+        return asyncio.sleep(secs)
+
+    async def close_async(self):
+        await self._client.aclose()
+
+
+RETRYABLE_ERRORS = (stripe.APIConnectionError, stripe.RateLimitError)
+
+retry_budget = RetryBudget(ratio=getattr(settings, 'STRIPE_RETRY_BUDGET_RATIO', 0.2))
+
+# One client per event loop, as httpx connections can't be shared across
+# loops: {loop: (StripeClient, PooledHTTPXClient)}. The pool references its
+# loop, so an entry must be closed and dropped when its loop ends, which
+# under WSGI is at the end of every request (see closes_async_client).
+_async_clients = {}
+
+
+def get_async_client():
+    """Return the pooled StripeClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.get(loop, (None, None))
+    if client is None:
+        if not getattr(settings, 'STRIPE_SECRET_KEY', None):
+            raise ImproperlyConfigured("STRIPE_SECRET_KEY is not set in Django settings")
+        import httpx
+
+        timeout = httpx.Timeout(
+            settings.STRIPE_READ_TIMEOUT,
+            connect=settings.STRIPE_CONNECT_TIMEOUT,
+            pool=settings.STRIPE_CONNECT_TIMEOUT,
+        )
+        base_addresses = {'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else {}
+        http_client = PooledHTTPXClient(max_connections=settings.STRIPE_POOL_SIZE, timeout=timeout)
+        client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            base_addresses=base_addresses,
+            max_network_retries=0,
+            http_client=http_client,
+        )
+        _async_clients[loop] = (client, http_client)
+    return client
+
+
+async def close_async_client():
+    """Close the running event loop's client and its connection pool, if any."""
+    _, http_client = _async_clients.pop(asyncio.get_running_loop(), (None, None))
+    if http_client is not None:
+        await http_client.close_async()
+
+
+def closes_async_client(view):
+    """
+    Close the Stripe client at the end of each request unless the view runs
+    on the server's own long-lived event loop (ASGI). Under WSGI, Django runs
+    every async view in a new event loop that ends with the request.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await close_async_client()
+
+    return wrapper
+
+
+def _is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, stripe.APIError) and (error.http_status or 0) >= 500
+
+
+async def call_with_retries(method, params, idempotency_key):
+    """
+    Await ``method(params)`` retrying transient failures with backoff while
+    the retry budget allows. The idempotency key makes retried POSTs safe;
+    reads pass None.
+    """
+    retry_budget.record_request()
+    attempts = settings.STRIPE_MAX_RETRIES + 1
+    options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+    for attempt in range(attempts):
+        try:
+            return await method(params, options=options)
+        except stripe.StripeError as error:
+            if attempt + 1 >= attempts or not _is_retryable(error) or not retry_budget.can_retry():
+                raise
+            await asyncio.sleep(min(0.25 * 2 ** attempt, 2.0))
+
+
+async def create_customer_async(user, payment_method_id, checkout_key):
+    client = get_async_client()
+    return await call_with_retries(
+        client.v1.customers.create_async,
+        {
+            'payment_method': payment_method_id,
+            'email': user.email,
+            'invoice_settings': {'default_payment_method': payment_method_id},
+        },
+        idempotency_key=f'customer-{checkout_key}',
+    )
+
+
+async def get_or_create_customer_async(user, payment_method_id, checkout_key):
+    """Async counterpart of get_or_create_customer."""
+    record = await sync_to_async(get_customer)(user.pk)
+    if record is None:
+        customer = await create_customer_async(user, payment_method_id, checkout_key)
+        record = await sync_to_async(_store_customer)(user, customer.id, payment_method_id)
+        await cache.aset(customer_cache_key(user.pk), record, CUSTOMER_CACHE_TIMEOUT)
+    customer_id, default_payment_method = record
+    if payment_method_id and payment_method_id != default_payment_method:
+        client = get_async_client()
+        payment_method = await call_with_retries(
+            lambda params, options: client.v1.payment_methods.retrieve_async(payment_method_id, params, options),
+            {},
+            idempotency_key=None,
+        )
+        if payment_method.customer != customer_id:
+            await call_with_retries(
+                lambda params, options: client.v1.payment_methods.attach_async(payment_method_id, params, options),
+                {'customer': customer_id},
+                idempotency_key=f'attach-{checkout_key}',
+            )
+        await sync_to_async(_remember_payment_method)(user, customer_id, payment_method_id)
+    return customer_id
+
+
+async def create_payment_intent_async(user, course, customer_id, payment_method_id, amount, checkout_key):
+    client = get_async_client()
+    return await call_with_retries(
+        client.v1.payment_intents.create_async,
+        {
+            'customer': customer_id,
+            'payment_method': payment_method_id,
+            'amount': amount,
+            'currency': 'inr',
+            'description': f'Payment for {course.title}',
+            'confirm': True,
+            'off_session': True,
+            'metadata': {'user_id': user.pk, 'course_id': course.pk, 'checkout_key': checkout_key},
+        },
+        idempotency_key=f'payment-{checkout_key}',
+    )
@@ -1,4 +1,7 @@
 from django import template
+from django.core.files.storage import default_storage
+
+from CoursePlatform import placeholders, thumbnails
 
 register = template.Library()
 
@@ -21,3 +24,28 @@ def split(value, delimiter=','):
     if not value:
         return []
     return value.split(delimiter)
+
+@register.filter
+def thumbnail_srcset(course, fmt='jpeg'):
+    """
+    ``srcset`` value listing the course's resized thumbnail variants in the
+    given format ('webp' or 'jpeg'). Empty until the variants are rendered.
+    """
+    return thumbnails.srcset(course.thumbnail_variants or {}, fmt)
+
+@register.filter
+def thumbnail_src(course, width=640):
+    """
+    URL of the smallest JPEG variant at least ``width`` pixels wide, falling
+    back to the largest variant and then to the original upload.
+    """
+    variants = (course.thumbnail_variants or {}).get('jpeg')
+    if not variants:
+        return course.thumbnail.url if course.thumbnail else ''
+    wide_enough = [name for variant_width, name in variants if variant_width >= int(width)]
+    return default_storage.url(wide_enough[0] if wide_enough else variants[-1][1])
+
+@register.filter
+def placeholder_url(course):
+    """URL of the locally generated card image for a course without a thumbnail."""
+    return placeholders.placeholder_url(course.level, course.category)
@@ -1,3 +1,938 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 
-# Create your tests here.
+import stripe
+
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from myapp.sample_data import SyntheticDataGenerator
+from myproject.testing import QueryBudgetMixin
+
+from . import catalog_cache, placeholders, stripe_utils, thumbnails, youtube
+from .conditional import public_page
+from .forms import CourseVideoFormSet, sparse_order
+from .fake_stripe import DECLINED_PAYMENT_METHOD, FakeStripe, sign_payload
+from .models import Course, CourseVideo, Enrollment, EnrollmentRollup, StripeEvent
+from .search import get_search_backend
+from .stats import get_enrollment_stats
+from .views import COURSES_PER_PAGE
+
+# Roughly 500 users, 20 courses, 250 videos and 2,000 enrollments
+SAMPLE_SCALE = 0.01
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query-count and wall-time ceilings of the CoursePlatform views and the admin."""
+
+    cache_clearers = (catalog_cache.clear,)
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(scale=SAMPLE_SCALE, seed=1, stdout=io.StringIO()).run()
+        # The course with the most lessons and enrollments is the worst case
+        cls.course = Course.objects.filter(is_published=True).order_by('-students_enrolled').first()
+        cls.admin_user = get_user_model().objects.create_superuser('perf-admin', 'perf-admin@example.com', 'x')
+        cls.student = get_user_model().objects.create_user('perf-student', password='x')
+
+    def setUp(self):
+        self.clear_caches()
+
+    def test_course_list(self):
+        self.assertWithinBudget(reverse('courseplatform:course_list'), queries=2)
+
+    def test_course_list_search_and_filters(self):
+        url = reverse('courseplatform:course_list') + '?search=python&level=BEGINNER&published=true'
+        self.assertWithinBudget(url, queries=2)
+
+    def test_course_list_cached_page(self):
+        url = reverse('courseplatform:course_list')
+        self.client.get(url)
+        # A cached page loads its courses by id in one query
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_course_detail(self):
+        # The conditional GET validators, then the course, curriculum and stats
+        self.assertWithinBudget(reverse('courseplatform:course_detail', args=[self.course.pk]), queries=4)
+
+    def test_anonymous_pages_revalidate(self):
+        pages = [
+            (reverse('courseplatform:course_list'), 0),
+            (reverse('courseplatform:course_detail', args=[self.course.pk]), 1),
+        ]
+        for url, queries in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                # An unchanged page is answered from its validators alone
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_signed_in_pages_are_private(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('courseplatform:course_detail', args=[self.course.pk]))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_course_detail_enrolled_student(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_login(self.student)
+        # Session and user lookups, then the enrollment check
+        self.assertWithinBudget(reverse('courseplatform:course_detail', args=[self.course.pk]), queries=6)
+
+    def test_payment_page(self):
+        self.client.force_login(self.student)
+        url = reverse('courseplatform:payment') + f'?course_id={self.course.pk}'
+        self.assertWithinBudget(url, queries=5)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin_user)
+        for model in admin.site._registry:
+            opts = model._meta
+            with self.subTest(model=opts.label):
+                url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+                self.assertWithinBudget(url, queries=8, seconds=2.0)
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.clear()
+
+    def search_page(self, **params):
+        response = self.client.get(reverse('courseplatform:course_list'), params)
+        return [course.title for course in response.context['courses']]
+
+    def test_title_matches_rank_first(self):
+        Course.objects.create(title='Web Apps', description='Built with django from scratch')
+        Course.objects.create(title='Django Fundamentals')
+        self.assertEqual(self.search_page(search='django'), ['Django Fundamentals', 'Web Apps'])
+
+    def test_prefix_match(self):
+        Course.objects.create(title='Photography Basics')
+        self.assertEqual(self.search_page(search='photo'), ['Photography Basics'])
+
+    def test_filters_narrow_the_matches(self):
+        for n in range(3):
+            Course.objects.create(title=f'Kotlin {n}', level='ADVANCED', is_published=True)
+        Course.objects.create(title='Mobile Apps', description='Kotlin basics', level='BEGINNER', is_published=True)
+        self.assertEqual(self.search_page(search='kotlin', level='BEGINNER'), ['Mobile Apps'])
+        self.assertEqual(self.search_page(search='kotlin', published='false'), [])
+
+    def test_every_match_is_reachable_by_paging(self):
+        for n in range(COURSES_PER_PAGE + 3):
+            Course.objects.create(title=f'Rust {n}', description='rust ' * (n % 4))
+        url = reverse('courseplatform:course_list')
+        for backend in ('SQLiteFTSSearchBackend', 'SimpleSearchBackend'):
+            with self.subTest(backend=backend), override_settings(COURSE_SEARCH_BACKEND=f'CoursePlatform.search.{backend}'):
+                catalog_cache.clear()
+                titles, cursor = [], None
+                while True:
+                    response = self.client.get(url, {'search': 'rust', **({'cursor': cursor} if cursor else {})})
+                    titles += [course.title for course in response.context['courses']]
+                    cursor = response.context['page'].next_cursor
+                    if cursor is None:
+                        break
+                self.assertEqual(sorted(titles), sorted(f'Rust {n}' for n in range(COURSES_PER_PAGE + 3)))
+
+    def test_index_follows_edits_and_deletes(self):
+        course = Course.objects.create(title='Spanish for Travellers')
+        backend = get_search_backend()
+        self.assertEqual(backend.search('spanish'), [course.pk])
+
+        course.title = 'French for Travellers'
+        course.save()
+        self.assertEqual(backend.search('spanish'), [])
+        self.assertEqual(backend.search('french'), [course.pk])
+
+        course.delete()
+        self.assertEqual(backend.search('french'), [])
+
+    @override_settings(COURSE_SEARCH_BACKEND='CoursePlatform.search.SimpleSearchBackend')
+    def test_simple_backend(self):
+        Course.objects.create(title='Web Apps', description='Built with django', level='ADVANCED')
+        Course.objects.create(title='Django Fundamentals', level='BEGINNER')
+        self.assertEqual(self.search_page(search='django'), ['Django Fundamentals', 'Web Apps'])
+        self.assertEqual(self.search_page(search='django', level='ADVANCED'), ['Web Apps'])
+
+
+class EnrollmentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Statistics', is_published=True)
+        cls.students = [get_user_model().objects.create_user(f'stats-{n}') for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_follow_enrollment_changes(self):
+        first, second, _ = (
+            Enrollment.objects.create(student=student, course=self.course) for student in self.students
+        )
+        self.assertEqual(
+            get_enrollment_stats(self.course.pk),
+            {'active': 3, 'completed': 0, 'dropped': 0, 'total': 3},
+        )
+        # Cached until an enrollment of the course changes
+        with self.assertNumQueries(0):
+            get_enrollment_stats(self.course.pk)
+
+        first.status = 'completed'
+        first.save()
+        second.delete()
+        self.assertEqual(
+            get_enrollment_stats(self.course.pk),
+            {'active': 1, 'completed': 1, 'dropped': 0, 'total': 2},
+        )
+
+    def test_course_page_shows_completions(self):
+        url = reverse('courseplatform:course_detail', args=[self.course.pk])
+        enrollment = Enrollment.objects.create(student=self.students[0], course=self.course, status='completed')
+        response = self.client.get(url)
+        self.assertContains(response, '1 completed')
+
+        # Dropping a completed enrollment leaves students_enrolled alone
+        enrollment.status = 'dropped'
+        enrollment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '1 completed')
+
+
+class StudentsEnrolledTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Algorithms', is_published=True)
+        cls.students = [get_user_model().objects.create_user(f'counter-{n}') for n in range(2)]
+
+    def students_enrolled(self):
+        return Course.objects.values_list('students_enrolled', flat=True).get(pk=self.course.pk)
+
+    def test_counter_follows_active_enrollments(self):
+        enrollment = Enrollment.objects.create(student=self.students[0], course=self.course)
+        self.assertEqual(self.students_enrolled(), 1)
+        enrollment.status = 'completed'
+        enrollment.save()
+        self.assertEqual(self.students_enrolled(), 0)
+        enrollment.status = 'active'
+        enrollment.save()
+        self.assertEqual(self.students_enrolled(), 1)
+        enrollment.delete()
+        self.assertEqual(self.students_enrolled(), 0)
+
+    def test_stale_copies_apply_one_transition(self):
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        enrollment = Enrollment.objects.create(student=self.students[1], course=self.course)
+        first, second = Enrollment.objects.get(pk=enrollment.pk), Enrollment.objects.get(pk=enrollment.pk)
+        first.status = 'completed'
+        first.save()
+        second.status = 'dropped'
+        second.save()
+        self.assertEqual(self.students_enrolled(), 1)
+        second.refresh_from_db()
+        self.assertIsNotNone(second.completed_at)
+        self.assertIsNotNone(second.dropped_at)
+
+    def test_bulk_deletes_release_seats_in_one_update(self):
+        other = Course.objects.create(title='Graphs', is_published=True)
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+            Enrollment.objects.create(student=student, course=other, status='completed')
+        with self.assertNumQueries(5):
+            # The course ids, the UPDATE and the DELETE in a savepoint
+            Enrollment.objects.filter(student__in=self.students).delete()
+        self.assertEqual(self.students_enrolled(), 0)
+
+    def test_user_deletion_releases_seats(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        self.students[0].delete()
+        self.assertEqual(self.students_enrolled(), 1)
+
+    def test_course_deletion_deletes_enrollments_in_one_statement(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        with CaptureQueriesContext(connection) as queries:
+            self.course.delete()
+        enrollment_statements = [
+            query['sql'] for query in queries.captured_queries if 'CoursePlatform_enrollment"' in query['sql']
+        ]
+        self.assertEqual(len(enrollment_statements), 1)
+        self.assertTrue(enrollment_statements[0].startswith('DELETE'))
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.clear()
+
+    def titles(self, **params):
+        response = self.client.get(reverse('courseplatform:course_list'), params)
+        return [course.title for course in response.context['courses']]
+
+    def test_equivalent_filters_share_a_key(self):
+        self.assertEqual(catalog_cache.make_key('  Python  SQL'), catalog_cache.make_key('python sql'))
+        self.assertEqual(catalog_cache.make_key(published='maybe'), catalog_cache.make_key())
+        self.assertNotEqual(catalog_cache.make_key(level='ADVANCED'), catalog_cache.make_key())
+
+    def test_course_changes_expire_cached_pages(self):
+        course = Course.objects.create(title='Docker Basics', is_published=True)
+        self.assertEqual(self.titles(), ['Docker Basics'])
+
+        course.title = 'Docker in Production'
+        course.save()
+        self.assertEqual(self.titles(), ['Docker in Production'])
+
+        Course.objects.create(title='Figma Basics', is_published=True)
+        self.assertEqual(self.titles(), ['Figma Basics', 'Docker in Production'])
+
+        course.delete()
+        self.assertEqual(self.titles(), ['Figma Basics'])
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make = Course.objects.create
+        cls.python = make(title='Python', category='Programming', level='BEGINNER', is_published=True)
+        cls.django = make(title='Django', category='Programming', level='INTERMEDIATE', is_published=True)
+        cls.sql = make(title='SQL', category='Data', level='BEGINNER', is_published=True)
+        cls.guitar = make(title='Guitar', category='Music', is_published=True)
+        cls.draft = make(title='Draft', category='Programming')
+        students = [get_user_model().objects.create_user(f'learner-{n}') for n in range(3)]
+        for student in students:
+            Enrollment.objects.create(student=student, course=cls.python)
+            Enrollment.objects.create(student=student, course=cls.sql)
+            Enrollment.objects.create(student=student, course=cls.draft)
+        Enrollment.objects.create(student=students[0], course=cls.django)
+
+    def setUp(self):
+        cache.clear()
+
+    def similar(self, course):
+        response = self.client.get(reverse('courseplatform:course_detail', args=[course.pk]))
+        return [similar.title for similar in response.context['similar_courses']]
+
+    def test_co_enrolled_published_courses_rank_first(self):
+        call_command('build_recommendations', stdout=io.StringIO())
+        similar = self.similar(self.python)
+        self.assertEqual(similar[0], 'SQL')
+        self.assertIn('Django', similar)
+        self.assertNotIn('Draft', similar)
+        self.assertNotIn('Python', similar)
+
+    def test_same_category_until_recommendations_are_built(self):
+        self.assertEqual(self.similar(self.python), ['Django'])
+        call_command('build_recommendations', stdout=io.StringIO())
+        late = Course.objects.create(title='Flask', category='Programming', is_published=True)
+        self.assertEqual(sorted(self.similar(late)), ['Django', 'Python'])
+
+
+class FakeStripeMixin:
+    """Runs every test against a fresh loopback FakeStripe (``self.fake``)."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.fake = FakeStripe()
+        self.fake.__enter__()
+        self.addCleanup(self.fake.__exit__, None, None, None)
+
+
+class FakeStripeTests(FakeStripeMixin, TestCase):
+    def test_idempotency_keys_replay_responses(self):
+        stripe_utils.initialize_stripe()
+        first = stripe.Customer.create(email='a@example.com', idempotency_key='customer-a')
+        again = stripe.Customer.create(email='a@example.com', idempotency_key='customer-a')
+        other = stripe.Customer.create(email='a@example.com', idempotency_key='customer-b')
+        self.assertEqual(first.id, again.id)
+        self.assertNotEqual(first.id, other.id)
+        self.assertEqual(self.fake.requests['POST /v1/customers'], 2)
+
+    def test_declined_card(self):
+        stripe_utils.initialize_stripe()
+        with self.assertRaises(stripe.CardError):
+            stripe.PaymentIntent.create(
+                amount=100, currency='inr', payment_method=DECLINED_PAYMENT_METHOD, confirm=True
+            )
+
+
+class AsyncPaymentTests(FakeStripeMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Paid Course', price=499, is_published=True)
+        cls.user = get_user_model().objects.create_user('async-buyer', email='async-buyer@example.com')
+
+    def pay(self, payment_method_id='pm_card_visa'):
+        self.client.force_login(self.user)
+        return self.client.post(
+            reverse('courseplatform:process_payment_async'),
+            json.dumps({'course_id': self.course.pk, 'payment_method_id': payment_method_id}),
+            content_type='application/json',
+        )
+
+    def test_payment_enrolls(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 200)
+        enrollment = Enrollment.objects.get(student=self.user, course=self.course)
+        self.assertEqual(enrollment.payment_status, 'completed')
+        self.assertEqual(self.fake.requests['POST /v1/payment_intents'], 1)
+
+    def test_declined_card(self):
+        response = self.pay(DECLINED_PAYMENT_METHOD)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Enrollment.objects.filter(student=self.user).exists())
+
+    def test_each_attempt_reaches_stripe(self):
+        # A retried decline is declined by Stripe again, not replayed
+        self.pay(DECLINED_PAYMENT_METHOD)
+        self.pay(DECLINED_PAYMENT_METHOD)
+        self.assertEqual(self.fake.requests['POST /v1/payment_intents'], 2)
+
+        # Buying again after unenrolling charges again
+        self.pay()
+        first = Enrollment.objects.get(student=self.user, course=self.course)
+        first.delete()
+        self.pay()
+        second = Enrollment.objects.get(student=self.user, course=self.course)
+        self.assertEqual(self.fake.requests['POST /v1/payment_intents'], 4)
+        self.assertNotEqual(first.payment_id, second.payment_id)
+        self.assertNotEqual(first.checkout_key, second.checkout_key)
+        self.assertTrue(second.checkout_key)
+
+    def test_clients_are_closed_with_their_event_loop(self):
+        # Each request under WSGI runs in its own event loop
+        for _ in range(3):
+            self.pay(DECLINED_PAYMENT_METHOD)
+        self.assertEqual(len(stripe_utils._async_clients), 0)
+
+
+class StripeCustomerTests(FakeStripeMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = [Course.objects.create(title=f'Paid {n}', price=499, is_published=True) for n in range(5)]
+        cls.user = get_user_model().objects.create_user('repeat-buyer', email='repeat-buyer@example.com')
+
+    def buy(self, course, payment_method_id, view='courseplatform:process_payment'):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse(view),
+            json.dumps({'course_id': course.pk, 'payment_method_id': payment_method_id}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_one_customer_per_user(self):
+        self.buy(self.courses[0], 'pm_card_visa')
+        self.buy(self.courses[1], 'pm_card_visa')
+        self.buy(self.courses[2], 'pm_card_visa', view='courseplatform:process_payment_async')
+        self.assertEqual(self.fake.requests['POST /v1/customers'], 1)
+        self.assertEqual(self.fake.requests['POST /v1/payment_methods/{id}/attach'], 0)
+        customer = self.user.stripe_customer
+        self.assertEqual(customer.default_payment_method, 'pm_card_visa')
+
+    def test_new_cards_are_attached_once(self):
+        self.buy(self.courses[0], 'pm_card_visa')
+        self.buy(self.courses[1], 'pm_card_mastercard')
+        # Back to the first card, which the customer already holds
+        self.buy(self.courses[2], 'pm_card_visa')
+        self.buy(self.courses[3], 'pm_card_mastercard', view='courseplatform:process_payment_async')
+        self.assertEqual(self.fake.requests['POST /v1/payment_methods/{id}/attach'], 1)
+        self.user.stripe_customer.refresh_from_db()
+        self.assertEqual(self.user.stripe_customer.default_payment_method, 'pm_card_mastercard')
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class StripeWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Webhook Course', price=499, is_published=True)
+        cls.user = get_user_model().objects.create_user('webhook-buyer')
+
+    def deliver(self, event, secret='whsec_test'):
+        payload = json.dumps(event)
+        return self.client.post(
+            reverse('courseplatform:stripe-webhook'),
+            payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret),
+        )
+
+    def checkout_completed(self, event_id='evt_1', payment_status='paid'):
+        return {
+            'id': event_id,
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': 'cs_1',
+                'object': 'checkout.session',
+                'payment_status': payment_status,
+                'amount_total': 49900,
+                'payment_intent': 'pi_1',
+                'metadata': {'user_id': str(self.user.pk), 'course_id': str(self.course.pk)},
+            }},
+        }
+
+    def test_paid_checkout_enrolls_once(self):
+        self.assertEqual(self.deliver(self.checkout_completed()).status_code, 200)
+        # Redelivered, and the same payment reported by a second event type
+        self.assertEqual(self.deliver(self.checkout_completed()).status_code, 200)
+        intent = {
+            'id': 'evt_2', 'object': 'event', 'type': 'payment_intent.succeeded',
+            'data': {'object': {
+                'id': 'pi_1', 'object': 'payment_intent', 'amount_received': 49900,
+                'metadata': {'user_id': str(self.user.pk), 'course_id': str(self.course.pk)},
+            }},
+        }
+        self.assertEqual(self.deliver(intent).status_code, 200)
+
+        enrollment = Enrollment.objects.get(student=self.user, course=self.course)
+        self.assertEqual((enrollment.payment_status, enrollment.payment_id), ('completed', 'pi_1'))
+        self.assertEqual(str(enrollment.payment_amount), '499.00')
+        self.assertEqual(StripeEvent.objects.count(), 2)
+
+    def test_unpaid_checkout_does_not_enroll(self):
+        self.deliver(self.checkout_completed(payment_status='unpaid'))
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(self.checkout_completed(), secret='whsec_other')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+        self.assertFalse(Enrollment.objects.exists())
+
+
+class StripePriceTests(FakeStripeMixin, TestCase):
+    def test_price_is_created_once_and_replaced_on_change(self):
+        course = Course.objects.create(title='Priced', price=499, is_published=True)
+        first = stripe_utils.ensure_stripe_price(course)
+        self.assertEqual(stripe_utils.ensure_stripe_price(course), first)
+        self.assertEqual(self.fake.requests['POST /v1/prices'], 1)
+
+        course.title = 'Priced, renamed'
+        course.save()
+        self.assertEqual(stripe_utils.ensure_stripe_price(course), first)
+        product = self.fake.objects[course.stripe_price.product_id]
+        self.assertEqual(product['name'], 'Priced, renamed')
+
+    def test_returning_to_an_earlier_price_creates_an_active_one(self):
+        course = Course.objects.create(title='Priced', price=499, is_published=True)
+        price_ids = []
+        for price in (499, 999, 499):
+            course.price = price
+            course.save()
+            price_ids.append(stripe_utils.ensure_stripe_price(course))
+
+        self.assertEqual(len(set(price_ids)), 3)
+        current = self.fake.objects[price_ids[-1]]
+        self.assertEqual(int(current['unit_amount']), 49900)
+        self.assertNotEqual(current.get('active'), 'false')
+        self.assertEqual(self.fake.objects[price_ids[0]]['active'], 'false')
+
+
+class YouTubeURLTests(SimpleTestCase):
+    def test_url_forms(self):
+        cases = {
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ': ('dQw4w9WgXcQ', ''),
+            'https://youtu.be/dQw4w9WgXcQ?t=42': ('dQw4w9WgXcQ', ''),
+            'youtube.com/shorts/dQw4w9WgXcQ': ('dQw4w9WgXcQ', ''),
+            'https://m.youtube.com/embed/dQw4w9WgXcQ': ('dQw4w9WgXcQ', ''),
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLabcdefghij': ('dQw4w9WgXcQ', 'PLabcdefghij'),
+            'https://www.youtube.com/playlist?list=PLabcdefghij': ('', 'PLabcdefghij'),
+            'https://vimeo.com/123456': ('', ''),
+            'https://www.youtube.com/watch?v=short': ('', ''),
+            '': ('', ''),
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(youtube.parse_youtube_url(url), expected)
+
+    def test_embed_url(self):
+        self.assertEqual(youtube.embed_url('dQw4w9WgXcQ'), 'https://www.youtube.com/embed/dQw4w9WgXcQ')
+        self.assertEqual(
+            youtube.embed_url('', 'PLabcdefghij'),
+            'https://www.youtube.com/embed/videoseries?list=PLabcdefghij',
+        )
+        self.assertEqual(youtube.embed_url(''), '')
+
+
+class CourseVideoTests(TestCase):
+    def test_save_stores_the_parsed_embed(self):
+        course = Course.objects.create(title='Videos')
+        video = CourseVideo.objects.create(course=course, title='Intro', youtube_url='https://youtu.be/dQw4w9WgXcQ')
+        self.assertEqual(video.video_id, 'dQw4w9WgXcQ')
+
+        video.youtube_url = 'https://www.youtube.com/watch?v=9bZkp7q19f0'
+        video.save(update_fields=['youtube_url'])
+        video.refresh_from_db()
+        self.assertEqual(video.video_id, '9bZkp7q19f0')
+        self.assertEqual(video.embed_url, 'https://www.youtube.com/embed/9bZkp7q19f0')
+
+
+class CurriculumFormSetTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Curriculum')
+        self.videos = [
+            CourseVideo.objects.create(
+                course=self.course, title=f'Lesson {n}', order=n * 10,
+                youtube_url=f'https://youtu.be/video{n:06d}',
+            )
+            for n in range(1, 4)
+        ]
+
+    def formset_data(self, rows):
+        data = {
+            'videos-TOTAL_FORMS': str(len(rows)),
+            'videos-INITIAL_FORMS': str(sum(1 for row in rows if row.get('id'))),
+            'videos-MIN_NUM_FORMS': '0',
+            'videos-MAX_NUM_FORMS': '1000',
+        }
+        for index, row in enumerate(rows):
+            for name, value in row.items():
+                data[f'videos-{index}-{name}'] = value
+        return data
+
+    def test_sparse_order_moves_only_the_moved_lesson(self):
+        self.assertEqual(sparse_order([30, 10, 20]), [4, 10, 20])
+        self.assertEqual(sparse_order([10, None, 20]), [10, 15, 20])
+        self.assertEqual(sparse_order([10, None, 11]), [10, 20, 30])
+
+    def test_save_bulk_applies_the_diff(self):
+        first, second, third = self.videos
+        rows = [
+            {'id': str(first.pk), 'course': str(self.course.pk), 'title': first.title,
+             'youtube_url': first.youtube_url, 'order': '10'},
+            {'id': str(second.pk), 'course': str(self.course.pk), 'title': second.title,
+             'youtube_url': second.youtube_url, 'order': '20', 'DELETE': 'on'},
+            {'id': str(third.pk), 'course': str(self.course.pk), 'title': third.title,
+             'youtube_url': third.youtube_url, 'order': '1'},
+            {'course': str(self.course.pk), 'title': 'Lesson 4',
+             'youtube_url': 'https://youtu.be/video000004', 'order': '40'},
+        ]
+        formset = CourseVideoFormSet(self.formset_data(rows), instance=self.course)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        # One DELETE, one bulk UPDATE and one INSERT inside a savepoint
+        with self.assertNumQueries(5):
+            formset.save_bulk()
+
+        self.assertEqual(
+            list(self.course.videos.values_list('title', 'order', 'video_id')),
+            [('Lesson 3', 4, 'video000003'), ('Lesson 1', 10, 'video000001'), ('Lesson 4', 20, 'video000004')],
+        )
+        self.assertEqual([video.pk for video, _ in formset.changed_objects], [third.pk])
+
+
+def make_image(width, height, fmt='PNG'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(THUMBNAIL_WIDTHS=(320, 640, 1280), THUMBNAIL_FORMATS=('webp', 'jpeg'))
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.pool = ThreadPoolExecutor(1)
+        self.addCleanup(self.pool.shutdown)
+
+    def test_render_never_upscales(self):
+        width, height, variants = thumbnails.render_variants(make_image(800, 400), (320, 640, 1280), ('webp',), 80)
+        self.assertEqual((width, height), (800, 400))
+        self.assertEqual([(fmt, w, h) for fmt, w, h, _ in variants], [('webp', 320, 160), ('webp', 640, 320), ('webp', 800, 400)])
+
+    def test_variants_are_recorded_and_shared_by_identical_images(self):
+        data = make_image(1000, 500)
+        first = Course.objects.create(title='First', thumbnail=SimpleUploadedFile('a.png', data))
+        second = Course.objects.create(title='Second', thumbnail=SimpleUploadedFile('b.png', data))
+
+        generation = catalog_cache.get_generation()
+        saved_at = Course.objects.get(pk=first.pk).updated_at
+        self.assertTrue(thumbnails.process_thumbnail(first.pk, pool=self.pool))
+        first.refresh_from_db()
+        record = first.thumbnail_variants
+        self.assertEqual(record['source'], first.thumbnail.name)
+        self.assertEqual(first.thumbnail_digest, record['digest'])
+        self.assertGreater(first.updated_at, saved_at)
+        self.assertGreater(catalog_cache.get_generation(), generation)
+        self.assertEqual([width for width, _ in record['webp']], [320, 640, 1000])
+        self.assertEqual([width for width, _ in record['jpeg']], [320, 640, 1000])
+
+        # Already up to date: nothing to do
+        self.assertFalse(thumbnails.process_thumbnail(first.pk, pool=self.pool))
+
+        # Same picture under another name reuses the stored files
+        self.assertTrue(thumbnails.process_thumbnail(second.pk, pool=self.pool))
+        second.refresh_from_db()
+        self.assertEqual(second.thumbnail_variants['jpeg'], record['jpeg'])
+        self.assertEqual(second.thumbnail_variants['source'], second.thumbnail.name)
+
+
+class PlaceholderTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_category_placeholder_is_rendered_once(self):
+        course = Course.objects.create(title='Pandas', category='Data Science', level='advanced')
+        url = placeholders.placeholder_url(course.level, course.category)
+        self.assertTrue(url.endswith('/advanced/data-science.webp'))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(default_storage.exists(placeholders.storage_name('advanced', 'data-science')))
+
+    def test_unknown_slugs_are_not_rendered(self):
+        url = placeholders.placeholder_url('beginner', 'No Such Category')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertFalse(default_storage.exists(placeholders.storage_name('beginner', 'no-such-category')))
+        self.assertEqual(self.client.get(placeholders.placeholder_url('beginner', '')).status_code, 200)
+
+
+ASSET = bytes(range(256)) * 64
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    """Serves ``ASSET`` at any path, honouring ``Range: bytes=N-``."""
+
+    def do_GET(self):
+        start = int(self.headers.get('Range', 'bytes=0-')[len('bytes='):].rstrip('-'))
+        body = ASSET[start:]
+        # Recorded before replying, or the client could finish reading first
+        self.server.requests.append((self.path, start))
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class IngestAssetsTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), AssetHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.dest = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dest, ignore_errors=True)
+
+    def ingest(self, sha256=None):
+        asset = {'path': 'images/asset.bin', 'url': 'asset.bin', 'size': len(ASSET),
+                 'sha256': sha256 or hashlib.sha256(ASSET).hexdigest()}
+        manifest = self.dest / 'assets.json'
+        manifest.write_text(json.dumps({'assets': [asset]}))
+        call_command(
+            'ingest_assets', manifest=str(manifest), dest=str(self.dest / 'static'), retries=1,
+            base_url='http://%s:%s/' % self.server.server_address, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        return self.dest / 'static' / 'images' / 'asset.bin'
+
+    def test_resumes_and_skips_valid_files(self):
+        partial = self.dest / 'static' / 'images' / 'asset.bin.part'
+        partial.parent.mkdir(parents=True)
+        partial.write_bytes(ASSET[:1000])
+
+        target = self.ingest()
+        self.assertEqual(target.read_bytes(), ASSET)
+        self.assertFalse(partial.exists())
+        self.assertEqual(self.server.requests, [('/asset.bin', 1000)])
+
+        self.ingest()
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_checksum_mismatch_fails_without_keeping_the_file(self):
+        with self.assertRaises(CommandError):
+            self.ingest(sha256='0' * 64)
+        self.assertEqual(list((self.dest / 'static' / 'images').iterdir()), [])
+
+
+class EnrollmentRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = [
+            Course.objects.create(title='Rollups', category='Data Science'),
+            Course.objects.create(title='Series', category='Programming'),
+        ]
+        cls.students = [get_user_model().objects.create_user(f'rollup-{n}') for n in range(4)]
+
+    def aggregated(self):
+        """Per (period, bucket, course) totals straight from the enrollment table."""
+        expected = {}
+        for period, truncate in ((EnrollmentRollup.HOUR, TruncHour), (EnrollmentRollup.DAY, TruncDay)):
+            for field, aggregates in (
+                ('enrolled_at', {'enrollments': Count('id'),
+                                 'revenue': Sum('payment_amount', filter=Q(payment_status='completed'))}),
+                ('completed_at', {'completions': Count('id')}),
+                ('dropped_at', {'drops': Count('id')}),
+            ):
+                grouped = (
+                    Enrollment.objects.filter(**{f'{field}__isnull': False}).order_by()
+                    .values('course_id', bucket=truncate(field)).annotate(**aggregates)
+                )
+                for row in grouped:
+                    counters = expected.setdefault(
+                        (period, row['bucket'], row['course_id']),
+                        {'enrollments': 0, 'completions': 0, 'drops': 0, 'revenue': Decimal(0)},
+                    )
+                    counters.update({name: row[name] or counters[name] for name in aggregates})
+        return expected
+
+    def rollups(self):
+        return {
+            (row.period, row.bucket, row.course_id): {name: getattr(row, name) for name in EnrollmentRollup.COUNTERS}
+            for row in EnrollmentRollup.objects.all()
+            if any(getattr(row, name) for name in EnrollmentRollup.COUNTERS)
+        }
+
+    def test_rollups_match_the_enrollment_table(self):
+        enrollments = [
+            Enrollment.objects.create(
+                student=student, course=self.courses[n % 2],
+                payment_status='completed' if n % 2 else '', payment_amount=Decimal('499.00') if n % 2 else None,
+            )
+            for n, student in enumerate(self.students)
+        ]
+        self.assertEqual(self.rollups(), self.aggregated())
+
+        enrollments[0].status = 'completed'
+        enrollments[0].save()
+        enrollments[1].status = 'dropped'
+        enrollments[1].save()
+        enrollments[2].status = 'completed'
+        enrollments[2].save()
+        self.assertEqual(self.rollups(), self.aggregated())
+
+        enrollments[2].delete()
+        enrollments[3].delete()
+        self.assertEqual(self.rollups(), self.aggregated())
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, 'needs SQLITE_PROFILE=production')
+class ReadReplicaTests(TransactionTestCase):
+    databases = '__all__'
+
+    def test_enrollment_loaded_from_the_replica_saves_and_deletes(self):
+        course = Course.objects.create(title='Replicated')
+        student = get_user_model().objects.create_user('replicated')
+        Enrollment.objects.create(student=student, course=course)
+
+        enrollment = Enrollment.objects.get(student=student, course=course)
+        self.assertEqual(enrollment._state.db, 'replica')
+        enrollment.status = 'completed'
+        enrollment.save()
+        self.assertEqual(enrollment._state.db, 'default')
+        self.assertEqual(Course.objects.get(pk=course.pk).students_enrolled, 0)
+        self.assertEqual(EnrollmentRollup.objects.filter(completions=1).count(), 2)
+
+        enrollment = Enrollment.objects.get(pk=enrollment.pk)
+        enrollment.delete()
+        self.assertFalse(Enrollment.objects.filter(pk=enrollment.pk).exists())
+        self.assertEqual(EnrollmentRollup.objects.filter(completions=1).count(), 0)
+
+    def test_course_loaded_from_the_replica_is_reindexed(self):
+        Course.objects.create(title='Replicated', is_published=True)
+        course = Course.objects.get(title='Replicated')
+        self.assertEqual(course._state.db, 'replica')
+        get_search_backend().index(course)
+        course.title = 'Mirrored'
+        course.save()
+        self.assertEqual(list(get_search_backend().search('mirrored')), [course.pk])
+
+
+class BenchCommandTests(TestCase):
+    @override_settings(DEBUG=False)
+    def test_refuses_to_write_without_seed_data(self):
+        for command in ('bench', 'bench_payments', 'bench_sqlite'):
+            with self.subTest(command=command), self.assertRaisesMessage(CommandError, '--seed-data'):
+                call_command(command, stdout=io.StringIO())
+        self.assertFalse(get_user_model().objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(Course.objects.filter(category='Benchmark').exists())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Conditional', is_published=True)
+        cls.student = get_user_model().objects.create_user('conditional')
+
+    def setUp(self):
+        cache.clear()
+        catalog_cache.clear()
+
+    def test_validators_are_etags_only(self):
+        url = reverse('courseplatform:course_detail', args=[self.course.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_course_etag_follows_changes_without_timestamps(self):
+        url = reverse('courseplatform:course_detail', args=[self.course.pk])
+        video = CourseVideo.objects.create(course=self.course, title='Intro', youtube_url='https://youtu.be/dQw4w9WgXcQ')
+        etag = self.client.get(url)['ETag']
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        video.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pages_setting_cookies_hand_out_no_validators(self):
+        @public_page(lambda request: '"v1"')
+        def sign_in_form(request):
+            return HttpResponse(get_token(request))
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        response = sign_in_form(request)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_catalog_etag_follows_the_generation(self):
+        url = reverse('courseplatform:course_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        catalog_cache.bump_generation()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
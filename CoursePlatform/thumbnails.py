@@ -0,0 +1,218 @@
+"""
+Responsive course thumbnails.
+
+When a course's thumbnail changes, resized WebP and JPEG variants are
+rendered with Pillow in a process pool (resizing is CPU bound) and stored
+under a name derived from the hash of the source image, so re-uploading the
+same picture reuses the files already there. The digest is kept in the
+indexed ``Course.thumbnail_digest`` column and the result is recorded on
+``Course.thumbnail_variants``::
+
+    {"source": "<thumbnail name>", "digest": "<sha256>",
+     "width": 1600, "height": 900,
+     "webp": [[320, "<name>"], [640, "<name>"], ...],
+     "jpeg": [[320, "<name>"], ...]}
+
+and templates turn it into ``srcset`` attributes with the ``thumbnail_srcset``
+and ``thumbnail_src`` filters in ``course_extras``.
+"""
+import atexit
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering changes so old variants aren't reused
+PIPELINE_VERSION = 1
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def get_widths():
+    return tuple(getattr(settings, "THUMBNAIL_WIDTHS", (320, 640, 960, 1280)))
+
+
+def get_formats():
+    return tuple(getattr(settings, "THUMBNAIL_FORMATS", ("webp", "jpeg")))
+
+
+def render_variants(data, widths, formats, quality):
+    """
+    Decode ``data`` and encode it at each of ``widths`` (never upscaling) in
+    each of ``formats``. Runs in a worker process, so it only takes and
+    returns plain values: ``(width, height, [(format, width, height, bytes)])``.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        image = image.convert("RGB")
+        source_width, source_height = image.size
+
+        targets = sorted({width for width in widths if width < source_width} | {min(source_width, max(widths))})
+        variants = []
+        for width in targets:
+            height = max(1, round(source_height * width / source_width))
+            resized = image if width == source_width else image.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                buffer = io.BytesIO()
+                options = {"quality": quality, "method": 6} if fmt == "webp" else {
+                    "quality": quality, "optimize": True, "progressive": True,
+                }
+                resized.save(buffer, PIL_FORMATS[fmt], **options)
+                variants.append((fmt, width, height, buffer.getvalue()))
+    return source_width, source_height, variants
+
+
+def variant_name(digest, width, fmt):
+    return f"course_thumbnails/variants/{digest[:2]}/{digest}-{width}w.{EXTENSIONS[fmt]}"
+
+
+def source_digest(data, widths, formats, quality):
+    params = f"v{PIPELINE_VERSION}:{widths}:{formats}:{quality}".encode()
+    return hashlib.sha256(params + data).hexdigest()
+
+
+def store_variants(thumbnail_name, rendered, digest):
+    """Save rendered variants to storage and build the ``thumbnail_variants`` record."""
+    width, height, variants = rendered
+    record = {"source": thumbnail_name, "digest": digest, "width": width, "height": height}
+    for fmt, variant_width, _, content in variants:
+        name = variant_name(digest, variant_width, fmt)
+        if not default_storage.exists(name):
+            saved = default_storage.save(name, ContentFile(content))
+            if saved != name:
+                # Lost a race with another writer of the same content
+                default_storage.delete(saved)
+        record.setdefault(fmt, []).append([variant_width, name])
+    return record
+
+
+_process_pool = None
+_dispatcher = None
+_pool_lock = Lock()
+
+
+def get_process_pool():
+    """
+    The shared rendering pool. Workers are spawned rather than forked: the
+    server is threaded, and a fork would copy whatever locks its other
+    threads happen to hold.
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            workers = getattr(settings, "THUMBNAIL_WORKERS", None) or min(4, os.cpu_count() or 1)
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+@atexit.register
+def shutdown_pools():
+    """Stop queued work and close the worker processes when the server exits."""
+    global _process_pool
+    # Renders already running in the dispatcher still need the process pool
+    if _dispatcher is not None:
+        _dispatcher.shutdown(wait=True, cancel_futures=True)
+    with _pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def process_thumbnail(course_id, pool=None, force=False):
+    """
+    Render and store the variants of one course's current thumbnail, unless
+    they are already recorded (or ``force``). Returns True if the course's
+    record was updated.
+    """
+    from .models import Course
+
+    course = Course.objects.filter(pk=course_id).only("thumbnail", "thumbnail_variants").first()
+    if course is None or not course.thumbnail:
+        return False
+    name = course.thumbnail.name
+    if course.thumbnail_variants.get("source") == name and not force:
+        return False
+
+    widths, formats = get_widths(), get_formats()
+    quality = getattr(settings, "THUMBNAIL_QUALITY", 80)
+    with course.thumbnail.open("rb") as source:
+        data = source.read()
+    digest = source_digest(data, widths, formats, quality)
+
+    # The same image already rendered for another course: reuse its files
+    existing = (
+        Course.objects.filter(thumbnail_digest=digest)
+        .values_list("thumbnail_variants", flat=True)
+        .first()
+    )
+    if existing is not None and not force:
+        record = {**existing, "source": name}
+    else:
+        pool = pool or get_process_pool()
+        rendered = pool.submit(render_variants, data, widths, formats, quality).result()
+        record = store_variants(name, rendered, digest)
+
+    # Skip the write if the thumbnail was replaced while we were rendering.
+    # update() sends no post_save, so do what the Course receivers would:
+    # move updated_at (the page validators) and expire the catalog pages.
+    updated = Course.objects.filter(pk=course_id, thumbnail=name).update(
+        thumbnail_variants=record, thumbnail_digest=digest, updated_at=timezone.now(),
+    )
+    if updated:
+        catalog_cache.bump_generation()
+    return bool(updated)
+
+
+def _process_in_background(course_id):
+    try:
+        process_thumbnail(course_id)
+    except Exception:
+        logger.exception("Rendering thumbnail variants failed for course %s", course_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnail(course_id, using=None):
+    """
+    Render a course's thumbnail variants once the current transaction
+    commits. With ``THUMBNAIL_BACKGROUND = False`` the work is done inline.
+    """
+    def dispatch():
+        global _dispatcher
+        if not getattr(settings, "THUMBNAIL_BACKGROUND", True):
+            process_thumbnail(course_id)
+            return
+        with _pool_lock:
+            if _dispatcher is None:
+                _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+        _dispatcher.submit(_process_in_background, course_id)
+
+    transaction.on_commit(dispatch, using=using)
+
+
+def srcset(record, fmt):
+    """``srcset`` attribute value for one format of a ``thumbnail_variants`` record."""
+    return ", ".join(f"{default_storage.url(name)} {width}w" for width, name in record.get(fmt, ()))
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from .enroll_views import enroll_course
+from .webhooks import stripe_webhook
 
 app_name = "courseplatform"
 
@@ -11,11 +12,15 @@ urlpatterns = [
     path("courses/<int:pk>/edit/", views.course_update, name="course_update"),
     path("courses/<int:pk>/delete/", views.course_delete, name="course_delete"),
     path("courses/enroll/<int:course_id>/", enroll_course, name="enroll_course"),
+    path("placeholders/<str:version>/<str:level>/<slug:slug>.webp", views.placeholder_image, name="placeholder"),
+    path("stats/enrollments/", views.enrollment_trends, name="enrollment_trends"),
     path("test-template-tags/", views.test_template_tags, name="test_template_tags"),
     path("payment/", views.payment_page, name="payment"),
     path("payment/process/", views.process_payment, name="process_payment"),
+    path("payment/process-async/", views.process_payment_async, name="process_payment_async"),
     path("create-checkout-session/<int:course_id>/", views.create_checkout_session, name="create-checkout-session"),
     path("success/", views.payment_success, name="payment-success"),
     path("cancel/", views.payment_cancel, name="payment-cancel"),
+    path("webhooks/stripe/", stripe_webhook, name="stripe-webhook"),
     path("checkout/<int:course_id>/", views.create_checkout_session, name="checkout"),
 ]
@@ -1,47 +1,96 @@
-from django.db.models import Q
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.forms import modelform_factory
-from .models import Course, CourseVideo, Enrollment
+from .models import Course, CourseVideo, Enrollment, EnrollmentRollup
 from .forms import CourseForm, CourseVideoFormSet
-from django.views.decorators.http import require_http_methods
+from . import catalog_cache, placeholders, rollups, stripe_utils
+from .conditional import catalog_version, course_version, public_page
+from .recommendations import get_similar_courses
+from .search import get_search_backend
+from .stats import get_enrollment_stats
+from myproject.pagination import KeysetPage, KeysetPaginator
+from django.views.decorators.http import etag, require_http_methods
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 import stripe
 from django.conf import settings
 from django.shortcuts import redirect, reverse
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 import json
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
 
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
 
+COURSES_PER_PAGE = 12
 
+PLACEHOLDER_MAX_AGE = 60 * 60 * 24 * 365
+
+# Default and maximum span of enrollment_trends, in buckets
+TREND_SPANS = {
+    EnrollmentRollup.HOUR: (48, 24 * 31),
+    EnrollmentRollup.DAY: (30, 366),
+}
+
+
+@public_page(catalog_version)
 def course_list(request):
     search = request.GET.get("search", "").strip()
     level = request.GET.get("level", "").strip()
     published = request.GET.get("published", "")
+    cursor = request.GET.get("cursor")
 
-    qs = Course.objects.all()
-    if search:
-        qs = qs.filter(
-            Q(title__icontains=search) |
-            Q(instructor__icontains=search) |
-            Q(category__icontains=search) |
-            Q(description__icontains=search)
+    cache_key = catalog_cache.make_key(search, level, published, cursor)
+    cached = catalog_cache.get_page(cache_key)
+    if cached is not None:
+        courses = Course.objects.in_bulk(cached.ids)
+        page = KeysetPage(
+            [courses[pk] for pk in cached.ids if pk in courses],
+            next_cursor=cached.next_cursor,
+            previous_cursor=cached.previous_cursor,
         )
-    if level:
-        qs = qs.filter(level=level)
-    if published in ("true", "false"):
-        qs = qs.filter(is_published=(published == "true"))
+    else:
+        lookups = {}
+        if level:
+            lookups["level"] = level
+        if published in ("true", "false"):
+            lookups["is_published"] = published == "true"
+
+        qs = Course.objects.filter(**lookups)
+        ordering = ("-created_at", "-id")
+        if search:
+            # Ranked in the database, so every page of matches is reachable
+            qs = get_search_backend().rank(qs, search)
+            ordering = ("search_rank", "-id")
+
+        page = KeysetPaginator(qs, ordering, per_page=COURSES_PER_PAGE).page(cursor)
+        catalog_cache.set_page(cache_key, page)
 
     levels = Course._meta.get_field("level").choices
+    filters = urlencode({k: v for k, v in (("search", search), ("level", level), ("published", published)) if v})
 
     return render(
         request,
         "CoursePlatform/course_list.html",
-        {"courses": qs, "search": search, "level": level, "levels": levels, "published": published},
+        {
+            "courses": page.object_list,
+            "page": page,
+            "filters": filters,
+            "search": search,
+            "level": level,
+            "levels": levels,
+            "published": published,
+        },
     )
 
 
@@ -54,13 +103,11 @@ def course_create(request):
             course = form.save(commit=False)
             if 'thumbnail' in request.FILES:
                 course.thumbnail = request.FILES['thumbnail']
-            course.save()
-            
-            # Save the formset with the course instance
-            videos = formset.save(commit=False)
-            for video in videos:
-                video.course = course
-                video.save()
+            with transaction.atomic():
+                course.save()
+                # Save the curriculum in batched statements
+                formset.instance = course
+                formset.save_bulk()
             
             return redirect("courseplatform:course_list")
     else:
@@ -83,17 +130,10 @@ def course_update(request, pk):
         if form.is_valid() and formset.is_valid():
             if 'thumbnail' in request.FILES:
                 course.thumbnail = request.FILES['thumbnail']
-            form.save()
-            
-            # Save the formset
-            videos = formset.save(commit=False)
-            for video in videos:
-                video.course = course
-                video.save()
-                
-            # Delete any videos marked for deletion
-            for video in formset.deleted_objects:
-                video.delete()
+            with transaction.atomic():
+                form.save()
+                # Apply curriculum edits, reorders and deletions as a batched diff
+                formset.save_bulk()
                 
             return redirect("courseplatform:course_list")
     else:
@@ -112,6 +152,7 @@ def course_update(request, pk):
     )
 
 
+@public_page(course_version)
 def course_detail(request, pk):
     course = get_object_or_404(Course, pk=pk)
     # Check if user is enrolled
@@ -123,28 +164,21 @@ def course_detail(request, pk):
             status='active'
         ).exists()
     
-    # Get similar courses
-    similar_courses = Course.objects.filter(
-        category=course.category,
-        is_published=True
-    ).exclude(id=course.id)[:4]
+    # Queried only if the template shows them
+    similar_courses = SimpleLazyObject(lambda: get_similar_courses(course))
     
-    # Get enrollment stats
-    enrollment_stats = {
-        'total': course.enrollments.count(),
-        'completed': course.enrollments.filter(status='completed').count(),
-        'active': course.enrollments.filter(status='active').count(),
-        'dropped': course.enrollments.filter(status='dropped').count(),
-    }
+    # Fetch the curriculum once; the template counts and iterates this list
+    videos = list(course.videos.all())
     
     return render(
         request,
         "CoursePlatform/course_detail.html",
         {
             "course": course,
+            "videos": videos,
             "is_enrolled": is_enrolled,
             "similar_courses": similar_courses,
-            "enrollment_stats": enrollment_stats,
+            "enrollment_stats": get_enrollment_stats(course.pk),
         },
     )
 
@@ -160,6 +194,53 @@ def course_delete(request, pk):
         {"course": course},
     )
 
+@require_http_methods(["GET", "HEAD"])
+@etag(lambda request, version, level, slug: f'"{version}-{level}-{slug}"')
+def placeholder_image(request, version, level, slug):
+    """
+    Card image for courses without a thumbnail. The URL is versioned and the
+    image never changes, so browsers may cache it for a year.
+    """
+    if version != placeholders.VERSION or level not in placeholders.LEVEL_TONES:
+        raise Http404("Unknown placeholder")
+    name = placeholders.get_placeholder(level, slug)
+    if name is None:
+        raise Http404("Unknown placeholder")
+    response = FileResponse(default_storage.open(name), content_type="image/webp")
+    patch_cache_control(response, public=True, max_age=PLACEHOLDER_MAX_AGE, immutable=True)
+    return response
+
+@staff_member_required
+@require_http_methods(["GET"])
+def enrollment_trends(request):
+    """
+    JSON enrollment, completion, drop and revenue series for the dashboard,
+    read from the pre-aggregated rollups. Query parameters: ``period``
+    (hour/day), ``span`` (number of buckets back from now), ``group``
+    (total/category/course), and optional ``category`` and ``course`` filters.
+    """
+    period = request.GET.get("period", EnrollmentRollup.DAY)
+    group = request.GET.get("group", "total")
+    if period not in TREND_SPANS or group not in rollups.GROUPS:
+        return JsonResponse({"error": "Invalid period or group"}, status=400)
+    default_span, max_span = TREND_SPANS[period]
+    try:
+        span = min(max(int(request.GET.get("span", default_span)), 1), max_span)
+        course_ids = [int(value) for value in request.GET.getlist("course")]
+    except ValueError:
+        return JsonResponse({"error": "span and course must be integers"}, status=400)
+
+    step = timedelta(hours=1) if period == EnrollmentRollup.HOUR else timedelta(days=1)
+    start = EnrollmentRollup.bucket_start(timezone.now(), period) - step * (span - 1)
+    return JsonResponse({
+        "period": period,
+        "group": group,
+        "start": timezone.localtime(start).isoformat(),
+        "series": rollups.series(
+            period, start, group=group, course_ids=course_ids, category=request.GET.get("category"),
+        ),
+    })
+
 def test_template_tags(request):
     """
     A view to test custom template tags
@@ -230,39 +311,39 @@ def process_payment(request):
             return JsonResponse({'redirect': reverse('courseplatform:course_detail', args=[course.id])})
         
         # Initialize Stripe
-        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe_utils.initialize_stripe()
         
         # Create payment intent
         amount = int((course.discount_price if course.discount_price else course.price) * 100)  # Convert to cents
         
+        checkout_key = stripe_utils.new_checkout_key()
         try:
-            # Create or retrieve customer
-            customer = stripe.Customer.create(
-                payment_method=payment_method_id,
-                email=request.user.email,
-                invoice_settings={
-                    'default_payment_method': payment_method_id
-                }
-            )
+            # Reuse the user's stored Stripe customer, creating it on first purchase
+            customer_id = stripe_utils.get_or_create_customer(request.user, payment_method_id, checkout_key)
             
             # Create payment intent
             payment_intent = stripe.PaymentIntent.create(
-                customer=customer.id,
+                customer=customer_id,
                 payment_method=payment_method_id,
                 amount=amount,
                 currency='inr',
                 description=f'Payment for {course.title}',
                 confirm=True,
                 off_session=True,
+                metadata={'user_id': request.user.id, 'course_id': course.id, 'checkout_key': checkout_key},
+                idempotency_key=f'payment-{checkout_key}',
             )
             
-            # Create enrollment
-            Enrollment.objects.create(
+            # Create enrollment, unless the payment webhook already did
+            Enrollment.objects.get_or_create(
                 student=request.user,
                 course=course,
-                payment_status='completed',
-                payment_amount=amount / 100,  # Convert back to rupees
-                payment_id=payment_intent.id
+                defaults={
+                    'payment_status': 'completed',
+                    'payment_amount': amount / 100,  # Convert back to rupees
+                    'payment_id': payment_intent.id,
+                    'checkout_key': checkout_key,
+                },
             )
             
             return JsonResponse({
@@ -280,6 +361,73 @@ def process_payment(request):
     except Exception as e:
         return JsonResponse({'error': 'An unexpected error occurred'}, status=500)
 
+@stripe_utils.closes_async_client
+async def process_payment_async(request):
+    """
+    Async variant of process_payment. Stripe is called through the pooled
+    client in stripe_utils, so a slow upstream parks a coroutine instead of
+    holding a worker thread.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid request data'}, status=400)
+    
+    course_id = data.get('course_id')
+    payment_method_id = data.get('payment_method_id')
+    if not course_id or not payment_method_id:
+        return JsonResponse({'error': 'Missing required parameters'}, status=400)
+    
+    course = await Course.objects.filter(id=course_id, is_published=True).afirst()
+    if course is None:
+        return JsonResponse({'error': 'Course not found'}, status=404)
+    
+    redirect_url = reverse('courseplatform:course_detail', args=[course.id])
+    if await Enrollment.objects.filter(student=user, course=course).aexists():
+        return JsonResponse({'redirect_url': redirect_url})
+    
+    amount = int((course.discount_price if course.discount_price else course.price) * 100)  # Convert to paise
+    
+    checkout_key = stripe_utils.new_checkout_key()
+    try:
+        customer_id = await stripe_utils.get_or_create_customer_async(user, payment_method_id, checkout_key)
+        payment_intent = await stripe_utils.create_payment_intent_async(
+            user, course, customer_id, payment_method_id, amount, checkout_key
+        )
+    except stripe.CardError as e:
+        return JsonResponse({'error': e.user_message or 'Your card was declined.'}, status=400)
+    except stripe.StripeError:
+        return JsonResponse({'error': 'Payment processing failed. Please try again.'}, status=502)
+    
+    if payment_intent.status == 'requires_action':
+        return JsonResponse({
+            'requires_action': True,
+            'client_secret': payment_intent.client_secret,
+            'redirect_url': redirect_url,
+        })
+    if payment_intent.status != 'succeeded':
+        return JsonResponse({'error': 'Payment was not completed.'}, status=400)
+    
+    # The payment_intent.succeeded webhook may get here first
+    await Enrollment.objects.aget_or_create(
+        student=user,
+        course=course,
+        defaults={
+            'payment_status': 'completed',
+            'payment_amount': Decimal(amount) / 100,
+            'payment_id': payment_intent.id,
+            'checkout_key': checkout_key,
+        },
+    )
+    return JsonResponse({'success': True, 'redirect_url': redirect_url})
+
 @csrf_exempt
 def create_checkout_session(request, course_id):
     if request.method != 'POST':
@@ -292,28 +440,18 @@ def create_checkout_session(request, course_id):
         return JsonResponse({'error': 'You are already enrolled in this course'}, status=400)
     
     try:
-        # Convert price to cents and ensure it's an integer
-        price = int(float(course.discount_price if course.discount_price else course.price) * 100)
-        
-        # Create a new checkout session
+        # Create a new checkout session against the course's cached Stripe price
         checkout_session = stripe.checkout.Session.create(
             payment_method_types=['card'],
             line_items=[
                 {
-                    'price_data': {
-                        'currency': 'inr',  # Using INR for Indian Rupees
-                        'unit_amount': price,
-                        'product_data': {
-                            'name': course.title,
-                            'description': course.description[:200],  # First 200 chars of description
-                        },
-                    },
+                    'price': stripe_utils.ensure_stripe_price(course),
                     'quantity': 1,
                 },
             ],
             mode='payment',
-            customer_email=request.user.email,
             client_reference_id=course_id,
+            **stripe_utils.checkout_customer_params(request.user),
             metadata={
                 'user_id': request.user.id,
                 'course_id': course_id
@@ -331,43 +469,29 @@ def create_checkout_session(request, course_id):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+@login_required
 def payment_success(request):
-    from django.http import HttpResponse
-    
-    session_id = request.GET.get('session_id')
+    """
+    Landing page after Stripe Checkout. Enrollment is created by the
+    stripe_webhook endpoint, so this only reads local state; if the webhook
+    hasn't arrived yet the page says the payment is being confirmed.
+    """
     course_id = request.GET.get('course_id')
-    
-    if not session_id or not course_id:
+    if not course_id or not course_id.isdigit():
         messages.error(request, 'Invalid request')
         return redirect('courseplatform:course_list')
     
-    try:
-        # Verify the session to ensure it's valid
-        session = stripe.checkout.Session.retrieve(session_id)
-        
-        # Get the course
-        course = get_object_or_404(Course, id=course_id, is_published=True)
-        
-        # Check if already enrolled to prevent duplicate enrollments
-        if not Enrollment.objects.filter(user=request.user, course=course).exists():
-            # Create enrollment record
-            Enrollment.objects.create(
-                user=request.user,
-                course=course,
-                payment_status='completed',
-                payment_amount=float(session.amount_total) / 100,  # Convert from cents
-                payment_id=session.payment_intent,
-                payment_date=timezone.now()
-            )
-        
-        # Render success page with course context
-        return render(request, 'CoursePlatform/payment_success.html', {
-            'course': course
-        })
-        
-    except Exception as e:
-        messages.error(request, f'Error processing your enrollment: {str(e)}')
-        return redirect('courseplatform:course_detail', pk=course_id)
+    enrollment = (
+        Enrollment.objects.select_related('course')
+        .filter(student=request.user, course_id=course_id)
+        .first()
+    )
+    
+    return render(request, 'CoursePlatform/payment_success.html', {
+        'enrollment': enrollment,
+        'course': enrollment.course if enrollment else None,
+        'course_id': course_id,
+    })
 
 def payment_cancel(request):
     messages.warning(request, 'Your payment was cancelled. You can complete your enrollment at any time.')
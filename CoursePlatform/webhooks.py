@@ -0,0 +1,78 @@
+import logging
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .models import Enrollment, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+
+def fulfil_enrollment(metadata, amount, payment_id):
+    """Create the paid enrollment described by a Stripe object's metadata, once."""
+    user_id, course_id = metadata.get('user_id'), metadata.get('course_id')
+    if not user_id or not course_id:
+        logger.warning("Stripe payment %s has no user/course metadata", payment_id)
+        return
+    Enrollment.objects.get_or_create(
+        student_id=int(user_id),
+        course_id=int(course_id),
+        defaults={
+            'payment_status': 'completed',
+            'payment_amount': Decimal(amount) / 100,
+            'payment_id': payment_id or '',
+            'checkout_key': metadata.get('checkout_key', ''),
+        },
+    )
+
+
+def handle_checkout_completed(session):
+    if session.get('payment_status') == 'paid':
+        fulfil_enrollment(session.get('metadata') or {}, session.get('amount_total') or 0, session.get('payment_intent'))
+
+
+def handle_payment_intent_succeeded(intent):
+    fulfil_enrollment(intent.get('metadata') or {}, intent.get('amount_received') or intent.get('amount') or 0, intent.get('id'))
+
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+    'checkout.session.async_payment_succeeded': handle_checkout_completed,
+    'payment_intent.succeeded': handle_payment_intent_succeeded,
+}
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Verify a Stripe webhook signature and apply the event exactly once.
+    If a handler fails, its StripeEvent row rolls back and Stripe's
+    redelivery retries it.
+    """
+    try:
+        event = stripe.Webhook.construct_event(
+            request.body,
+            request.META.get('HTTP_STRIPE_SIGNATURE', ''),
+            settings.STRIPE_WEBHOOK_SECRET,
+        )
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
+
+    handler = EVENT_HANDLERS.get(event['type'])
+    if handler is None:
+        return HttpResponse(status=200)
+
+    with transaction.atomic():
+        _, created = StripeEvent.objects.get_or_create(
+            event_id=event['id'],
+            defaults={'type': event['type']},
+        )
+        if created:
+            handler(event['data']['object'].to_dict())
+    return HttpResponse(status=200)
@@ -0,0 +1,70 @@
+"""
+YouTube URL parsing. Runs when a ``CourseVideo`` is saved (and in the
+``backfill_video_embeds`` command); templates read the stored results.
+"""
+import re
+from urllib.parse import parse_qs, urlencode, urlparse
+
+EMBED_BASE = "https://www.youtube.com/embed/"
+
+VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+PLAYLIST_ID = re.compile(r"^[A-Za-z0-9_-]{10,64}$")
+
+YOUTUBE_HOSTS = {
+    "youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+    "youtube-nocookie.com",
+}
+
+# Path prefixes that are followed by the video id
+ID_PATHS = ("embed", "shorts", "live", "v", "e")
+
+
+def _host(netloc):
+    host = netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_youtube_url(url):
+    """
+    Return ``(video_id, playlist_id)`` for a YouTube URL; either may be ``""``.
+
+    Understands youtu.be/<id>, /watch?v=<id>, /shorts/<id>, /embed/<id>,
+    /live/<id> and /playlist?list=<id>, on www., m. and nocookie hosts.
+    """
+    if not url:
+        return "", ""
+    parsed = urlparse(url.strip())
+    if not parsed.netloc and not parsed.scheme:
+        parsed = urlparse(f"https://{url.strip()}")
+    host = _host(parsed.netloc)
+    query = parse_qs(parsed.query)
+    segments = [segment for segment in parsed.path.split("/") if segment]
+
+    video_id = ""
+    if host == "youtu.be":
+        video_id = segments[0] if segments else ""
+    elif host in YOUTUBE_HOSTS:
+        if segments[:1] == ["watch"]:
+            video_id = query.get("v", [""])[0]
+        elif len(segments) >= 2 and segments[0] in ID_PATHS and segments[1] != "videoseries":
+            video_id = segments[1]
+    else:
+        return "", ""
+
+    playlist_id = query.get("list", [""])[0]
+    return (
+        video_id if VIDEO_ID.match(video_id) else "",
+        playlist_id if PLAYLIST_ID.match(playlist_id) else "",
+    )
+
+
+def embed_url(video_id, playlist_id=""):
+    """The iframe URL for a video, a playlist, or a video within a playlist."""
+    if video_id:
+        suffix = f"?{urlencode({'list': playlist_id})}" if playlist_id else ""
+        return f"{EMBED_BASE}{video_id}{suffix}"
+    if playlist_id:
+        return f"{EMBED_BASE}videoseries?{urlencode({'list': playlist_id})}"
+    return ""
@@ -1,14 +1,40 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from datetime import date, timedelta
 from myapp.models import Students
 from CoursePlatform.models import Course
 import random
 
+from myapp.sample_data import SyntheticDataGenerator
+
 class Command(BaseCommand):
     help = 'Populate the database with sample students and courses'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0,
+            help=(
+                'Generate a synthetic dataset instead: 1.0 is 100k students, 50k users, 2k courses, '
+                '~24k videos and ~200k enrollments; sizes grow linearly'
+            ),
+        )
+        parser.add_argument('--seed', type=int, default=42, help='RNG seed for --scale; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT for --scale')
+
     def handle(self, *args, **options):
+        if options['scale']:
+            generator = SyntheticDataGenerator(
+                scale=options['scale'], seed=options['seed'], batch_size=options['batch_size'], stdout=self.stdout,
+            )
+            try:
+                generator.run()
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write(self.style.SUCCESS(generator.summary()))
+            return
+
         self.stdout.write('Creating sample data...')
         
         # Sample student data
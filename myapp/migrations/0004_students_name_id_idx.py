@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_alter_students_lastname'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='students',
+            index=models.Index(models.F('firstname'), django.db.models.functions.comparison.Coalesce('lastname', models.Value('')), models.F('id'), name='students_name_id_idx'),
+        ),
+    ]
@@ -1,9 +1,20 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 
 class Students(models.Model):
     firstname = models.CharField(max_length=255, blank=True)
     lastname = models.CharField(max_length=255, null=True, blank=True)
     phone = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            # Matches the keyset ordering used by studentRead
+            models.Index(
+                F('firstname'), Coalesce('lastname', Value('')), F('id'),
+                name='students_name_id_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.firstname or "Student"
@@ -0,0 +1,286 @@
+"""
+Synthetic dataset for sizing and benchmarks (``populate_sample_data --scale``).
+
+Rows are generated lazily and written with batched ``bulk_create``, so memory
+stays flat however many are requested; only the primary keys needed for
+foreign keys are kept, in compact arrays. A seeded RNG makes every run with
+the same seed and scale produce the same data.
+
+The shape aims at production rather than uniform noise: course popularity
+follows a Zipf curve (a few courses hold most enrollments), enrollments per
+user are exponentially distributed, and statuses, levels, prices and
+publication follow fixed mixes.
+
+``bulk_create`` skips ``save()`` and signals, so the derived state they keep
+up to date is rebuilt once at the end: enrollment counters and rollups, the
+search index, the catalog cache generation and the dashboard counters.
+"""
+import itertools
+import random
+import time
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from CoursePlatform import catalog_cache, rollups, youtube
+from CoursePlatform.forms import ORDER_STEP
+from CoursePlatform.models import Course, CourseVideo, Enrollment
+from CoursePlatform.search import get_search_backend
+from myapp import stats
+from myapp.models import Students
+
+# Row counts at --scale 1
+BASE_STUDENTS = 100_000
+BASE_USERS = 50_000
+BASE_COURSES = 2_000
+MEAN_VIDEOS_PER_COURSE = 12
+MEAN_ENROLLMENTS_PER_USER = 4
+MAX_ENROLLMENTS_PER_USER = 40
+
+# Exponent of the course popularity curve
+POPULARITY_SKEW = 1.07
+
+STATUS_MIX = (('active', 70), ('completed', 20), ('dropped', 10))
+# How far back enrollments go
+ENROLLMENT_WINDOW = timedelta(days=365)
+LEVEL_MIX = (('BEGINNER', 50), ('INTERMEDIATE', 35), ('ADVANCED', 15))
+PRICE_TIERS = (
+    (Decimal('0.00'), 10),
+    (Decimal('499.00'), 25),
+    (Decimal('999.00'), 30),
+    (Decimal('1999.00'), 20),
+    (Decimal('3499.00'), 10),
+    (Decimal('4999.00'), 5),
+)
+PUBLISHED_RATIO = 0.9
+DISCOUNT_RATIO = 0.25
+
+FIRST_NAMES = (
+    'Alex', 'Sarah', 'Michael', 'Emily', 'David', 'Jessica', 'Daniel', 'Ashley', 'Christopher', 'Amanda',
+    'Matthew', 'Jennifer', 'Joshua', 'Michelle', 'Andrew', 'Priya', 'Arjun', 'Ananya', 'Rohan', 'Meera',
+    'Wei', 'Mei', 'Carlos', 'Lucia', 'Omar', 'Fatima', 'Kenji', 'Yuki', 'Olga', 'Ivan',
+)
+LAST_NAMES = (
+    'Johnson', 'Williams', 'Brown', 'Davis', 'Miller', 'Wilson', 'Moore', 'Taylor', 'Anderson', 'Thomas',
+    'Jackson', 'White', 'Harris', 'Martin', 'Thompson', 'Sharma', 'Patel', 'Iyer', 'Reddy', 'Gupta',
+    'Chen', 'Wang', 'Garcia', 'Lopez', 'Hassan', 'Khan', 'Tanaka', 'Sato', 'Ivanova', 'Petrov',
+)
+CATEGORIES = (
+    'Programming', 'Web Development', 'Data Science', 'Computer Science', 'Mobile Development',
+    'Digital Marketing', 'SEO', 'Social Media', 'Design', 'Business', 'Photography', 'Music',
+    'Health', 'Mathematics', 'Language',
+)
+TOPICS = (
+    'Python', 'JavaScript', 'Django', 'React', 'SQL', 'Machine Learning', 'Statistics', 'Algorithms',
+    'Kotlin', 'Swift', 'SEO', 'Copywriting', 'Branding', 'Figma', 'Photoshop', 'Excel', 'Accounting',
+    'Guitar', 'Nutrition', 'Calculus', 'Spanish', 'Public Speaking', 'Leadership', 'Docker',
+)
+TITLE_PATTERNS = (
+    '{topic} Fundamentals', 'Mastering {topic}', '{topic} for Beginners', 'Advanced {topic}',
+    'Practical {topic}', '{topic} in 30 Days', 'The Complete {topic} Bootcamp', '{topic} Projects',
+)
+VIDEO_ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+
+def _weighted(mix):
+    values, weights = zip(*mix)
+    return values, list(itertools.accumulate(weights))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class SyntheticDataGenerator:
+    def __init__(self, scale=1.0, seed=42, batch_size=5000, stdout=None):
+        self.scale = scale
+        self.seed = seed
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.rng = random.Random(seed)
+        # Usernames carry the seed so datasets of different seeds can coexist
+        self.username_prefix = f'sample-{seed}-'
+        self.rates = []
+
+    def count(self, base):
+        return max(1, round(base * self.scale))
+
+    def run(self):
+        User = get_user_model()
+        if User.objects.filter(username__startswith=self.username_prefix).exists():
+            raise ValueError(
+                f'Sample users for seed {self.seed} already exist; pick another --seed'
+            )
+
+        self.insert(Students, self.students(self.count(BASE_STUDENTS)))
+        user_ids = self.insert(User, self.users(self.count(BASE_USERS)), keep_ids=True)
+        courses = list(self.courses(self.count(BASE_COURSES)))
+        course_ids = self.insert(Course, courses, keep_ids=True)
+        prices = [course.discount_price or course.price for course in courses]
+        del courses
+        self.insert(CourseVideo, self.videos(course_ids))
+        self.insert(Enrollment, self.enrollments(user_ids, course_ids, prices), preserve=('enrolled_at',))
+        self.rebuild_derived_state()
+
+    def insert(self, model, rows, keep_ids=False, preserve=()):
+        """
+        Bulk-insert ``rows`` in batches and record the rate; returns the new
+        pks if asked. ``preserve`` names ``auto_now_add`` fields whose
+        generated values are written back with ``bulk_update``, since
+        ``bulk_create`` stamps them with the current time.
+        """
+        ids = array('q')
+        total = 0
+        started = time.perf_counter()
+        with transaction.atomic():
+            for batch in batched(rows, self.batch_size):
+                generated = [[getattr(obj, name) for name in preserve] for obj in batch]
+                created = model.objects.bulk_create(batch, batch_size=self.batch_size)
+                if preserve:
+                    for obj, values in zip(created, generated):
+                        for name, value in zip(preserve, values):
+                            setattr(obj, name, value)
+                    model.objects.bulk_update(created, preserve, batch_size=self.batch_size)
+                if keep_ids:
+                    ids.extend(obj.pk for obj in created)
+                total += len(batch)
+        elapsed = time.perf_counter() - started
+        self.rates.append((model._meta.label, total, elapsed))
+        if self.stdout is not None:
+            rate = total / elapsed if elapsed else 0.0
+            self.stdout.write(
+                f'{model._meta.label}: {total:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)'
+            )
+        return ids
+
+    def summary(self):
+        total = sum(rows for _, rows, _ in self.rates)
+        elapsed = sum(seconds for _, _, seconds in self.rates)
+        rate = total / elapsed if elapsed else 0.0
+        return f'Generated {total:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s, seed {self.seed})'
+
+    def students(self, count):
+        rng = self.rng
+        for _ in range(count):
+            yield Students(
+                firstname=rng.choice(FIRST_NAMES),
+                lastname=rng.choice(LAST_NAMES) if rng.random() > 0.05 else None,
+                phone=rng.randint(5550000000, 5559999999),
+            )
+
+    def users(self, count):
+        User = get_user_model()
+        rng = self.rng
+        # Hashing a password per row would dominate the run; sample users can't log in
+        password = make_password(None)
+        for n in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield User(
+                username=f'{self.username_prefix}{n}',
+                first_name=first,
+                last_name=last,
+                email=f'{first}.{last}.{n}@example.com'.lower(),
+                password=password,
+            )
+
+    def courses(self, count):
+        rng = self.rng
+        levels, level_weights = _weighted(LEVEL_MIX)
+        prices, price_weights = _weighted(PRICE_TIERS)
+        now = timezone.now()
+        for _ in range(count):
+            topic = rng.choice(TOPICS)
+            title = rng.choice(TITLE_PATTERNS).format(topic=topic)
+            price = rng.choices(prices, cum_weights=price_weights)[0]
+            is_published = rng.random() < PUBLISHED_RATIO
+            start_date = date.today() + timedelta(days=rng.randint(-180, 60))
+            duration = rng.choice(Course.DURATION_CHOICES)[0]
+            yield Course(
+                title=title,
+                short_description=f'Learn {topic} step by step with hands-on exercises.',
+                description=f'{title}: a practical course on {topic}, from first principles to real projects.',
+                instructor=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                level=rng.choices(levels, cum_weights=level_weights)[0],
+                category=rng.choice(CATEGORIES),
+                is_published=is_published,
+                is_featured=rng.random() < 0.02,
+                start_date=start_date,
+                end_date=start_date + timedelta(weeks=duration),
+                duration=duration,
+                price=price,
+                discount_price=(price * Decimal('0.8')).quantize(Decimal('1.00'))
+                if price and rng.random() < DISCOUNT_RATIO else None,
+                average_rating=Decimal(rng.randint(300, 500)) / 100,
+                total_reviews=rng.randint(0, 500),
+                # bulk_create skips Course.save(), which sets this
+                published_at=now if is_published else None,
+            )
+
+    def videos(self, course_ids):
+        rng = self.rng
+        for course_id in course_ids:
+            for position in range(max(1, round(rng.expovariate(1 / MEAN_VIDEOS_PER_COURSE)))):
+                video_id = ''.join(rng.choices(VIDEO_ID_ALPHABET, k=11))
+                yield CourseVideo(
+                    course_id=course_id,
+                    title=f'Lesson {position + 1}',
+                    youtube_url=f'https://www.youtube.com/watch?v={video_id}',
+                    order=ORDER_STEP * (position + 1),
+                    # Set here since bulk_create skips CourseVideo.save()
+                    video_id=video_id,
+                    embed_url=youtube.embed_url(video_id),
+                )
+
+    def enrollments(self, user_ids, course_ids, prices):
+        rng = self.rng
+        # Popularity by a Zipf curve over a shuffled ranking, so the popular
+        # courses are spread over the id range
+        ranks = list(range(1, len(course_ids) + 1))
+        rng.shuffle(ranks)
+        positions = range(len(course_ids))
+        popularity = list(itertools.accumulate(1 / rank ** POPULARITY_SKEW for rank in ranks))
+        statuses, status_weights = _weighted(STATUS_MIX)
+        now = timezone.now()
+        max_per_user = min(MAX_ENROLLMENTS_PER_USER, len(course_ids))
+
+        for user_id in user_ids:
+            wanted = min(max_per_user, 1 + round(rng.expovariate(1 / max(MEAN_ENROLLMENTS_PER_USER - 1, 1))))
+            chosen = set(rng.choices(positions, cum_weights=popularity, k=wanted))
+            for position in sorted(chosen):
+                status = rng.choices(statuses, cum_weights=status_weights)[0]
+                price = prices[position]
+                # Enrolled some time in the past year; completed or dropped since
+                enrolled_at = now - timedelta(seconds=rng.uniform(0, ENROLLMENT_WINDOW.total_seconds()))
+                ended_at = enrolled_at + (now - enrolled_at) * rng.random()
+                yield Enrollment(
+                    student_id=user_id,
+                    course_id=course_ids[position],
+                    status=status,
+                    enrolled_at=enrolled_at,
+                    completed_at=ended_at if status == 'completed' else None,
+                    dropped_at=ended_at if status == 'dropped' else None,
+                    payment_status='completed' if price else '',
+                    payment_amount=price or None,
+                    payment_id=f'pi_sample_{self.seed}_{user_id}_{position}' if price else '',
+                )
+
+    def rebuild_derived_state(self):
+        started = time.perf_counter()
+        call_command('reconcile_enrollment_counts', stdout=self.stdout)
+        indexed = get_search_backend().rebuild()
+        rollups.rebuild()
+        catalog_cache.bump_generation()
+        stats.refresh_snapshot()
+        if self.stdout is not None:
+            self.stdout.write(
+                f'Rebuilt enrollment counts and rollups and the search index ({indexed:,} courses) '
+                f'in {time.perf_counter() - started:.1f}s'
+            )
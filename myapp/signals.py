@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from CoursePlatform.models import Course
+
+from .models import Students
+from .stats import adjust_counter, expire_counter
+
+User = get_user_model()
+
+COUNTERS_BY_MODEL = {
+    Students: 'student_count',
+    Course: 'course_count',
+    User: 'user_count',
+}
+
+
+def _on_commit_adjust(name, delta, using):
+    # After commit, so a rolled back insert or delete never moves a counter
+    transaction.on_commit(lambda: adjust_counter(name, delta), using=using)
+
+
+# Connected per counted model: a receiver for every sender would keep Django
+# from fast-deleting any cascade, such as a course's enrollments
+@receiver(post_save, sender=Students)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=User)
+def count_created_row(sender, instance, created, raw=False, using=None, **kwargs):
+    name = COUNTERS_BY_MODEL.get(sender)
+    if name is None or not created or raw:
+        return
+    _on_commit_adjust(name, 1, using)
+
+
+@receiver(post_delete, sender=Students)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=User)
+def count_deleted_row(sender, instance, using=None, **kwargs):
+    name = COUNTERS_BY_MODEL.get(sender)
+    if name is not None:
+        _on_commit_adjust(name, -1, using)
+
+
+@receiver(post_save, sender=Course)
+def count_published_course(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.is_published:
+            _on_commit_adjust('published_courses', 1, using)
+        return
+    # Course.save() moves _loaded_is_published only after the receivers run
+    stored = instance._loaded_is_published
+    if stored is None:
+        # Built by hand or loaded without the flag: recount on next read
+        transaction.on_commit(lambda: expire_counter('published_courses'), using=using)
+    elif stored != instance.is_published:
+        _on_commit_adjust('published_courses', 1 if instance.is_published else -1, using)
+
+
+@receiver(post_delete, sender=Course)
+def uncount_published_course(sender, instance, using=None, **kwargs):
+    if instance.is_published:
+        _on_commit_adjust('published_courses', -1, using)
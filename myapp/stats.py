@@ -0,0 +1,111 @@
+"""
+Site-wide counters shown on the dashboard and home page.
+
+``get_snapshot`` reads all counters from the cache in one round trip. A
+missing counter is computed once and cached; after that, ``signals.py``
+adjusts it by one as rows are created and deleted, so the pages never count
+tables. Counters also expire after ``SNAPSHOT_TIMEOUT`` to bound any drift,
+such as rows written with ``bulk_create``, which bypasses signals.
+
+Tables estimated to hold more than ``STATS_EXACT_COUNT_LIMIT`` rows are not
+counted exactly; the database's own row estimate is used instead.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from CoursePlatform.models import Course
+
+from .models import Students
+
+SNAPSHOT_TIMEOUT = 60 * 60
+
+KEY_PREFIX = "myapp:stats:"
+
+
+def counters():
+    """``{name: (model, filters)}`` of every counter in the snapshot."""
+    return {
+        "student_count": (Students, {}),
+        "course_count": (Course, {}),
+        "user_count": (get_user_model(), {}),
+        "published_courses": (Course, {"is_published": True}),
+    }
+
+
+def counter_key(name):
+    return f"{KEY_PREFIX}{name}"
+
+
+def estimated_count(model, using=DEFAULT_DB_ALIAS):
+    """
+    The database's estimate of the number of rows in ``model``'s table, or
+    None if it has none (SQLite only keeps one after ``ANALYZE``).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of each stat row is the row count of the table
+            # (or of a partial index, which can only be smaller)
+            cursor.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that was never vacuumed or analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def compute_counter(name):
+    model, filters = counters()[name]
+    limit = getattr(settings, "STATS_EXACT_COUNT_LIMIT", 500_000)
+    if not filters:
+        estimate = estimated_count(model)
+        if estimate is not None and estimate > limit:
+            return estimate
+    return model.objects.filter(**filters).count()
+
+
+def get_snapshot():
+    """Return every counter, computing and caching only the missing ones."""
+    names = list(counters())
+    cached = cache.get_many([counter_key(name) for name in names])
+    snapshot, missing = {}, {}
+    for name in names:
+        value = cached.get(counter_key(name))
+        if value is None:
+            value = missing[counter_key(name)] = compute_counter(name)
+        snapshot[name] = value
+    if missing:
+        cache.set_many(missing, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def adjust_counter(name, delta):
+    """Add ``delta`` to a cached counter; a counter not in the cache is left to be recomputed."""
+    try:
+        cache.incr(counter_key(name), delta)
+    except ValueError:
+        pass
+
+
+def expire_counter(name):
+    cache.delete(counter_key(name))
+
+
+def refresh_snapshot():
+    """Recompute and cache every counter."""
+    cache.delete_many([counter_key(name) for name in counters()])
+    return get_snapshot()
@@ -1,3 +1,188 @@
+import io
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from CoursePlatform.models import Course, Enrollment
+from myproject.pagination import KeysetPaginator
+from myproject.testing import QueryBudgetMixin
+
+from . import stats
+from .models import Students
+from .sample_data import ENROLLMENT_WINDOW, SyntheticDataGenerator
+
+# Roughly 1,000 students, 500 users and 20 courses
+SAMPLE_SCALE = 0.01
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query-count and wall-time ceilings of the dashboard and student pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(scale=SAMPLE_SCALE, seed=2, stdout=io.StringIO()).run()
+
+    def setUp(self):
+        self.clear_caches()
+
+    def test_dashboard(self):
+        # Counters computed from scratch, plus the recent students
+        self.assertWithinBudget(reverse('dashboardName'), queries=8)
+
+    def test_dashboard_with_cached_counters(self):
+        self.client.get(reverse('dashboardName'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('dashboardName'))
+
+    def test_home(self):
+        self.assertWithinBudget(reverse('homeName'), queries=7)
+
+    def test_student_list(self):
+        self.assertWithinBudget(reverse('studentRead'), queries=1)
+
+    def test_student_list_search(self):
+        self.assertWithinBudget(reverse('studentRead') + '?search=patel', queries=1)
+
+    def test_student_list_next_page(self):
+        response = self.client.get(reverse('studentRead'))
+        cursor = response.context['page'].next_cursor
+        self.assertTrue(cursor)
+        self.assertWithinBudget(reverse('studentRead') + f'?cursor={cursor}', queries=1)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated first names and null last names exercise every key of the ordering
+        Students.objects.bulk_create(
+            Students(firstname=['Ana', 'Ben'][n % 2], lastname=[None, 'Khan', 'Patel'][n % 3], phone=n)
+            for n in range(40)
+        )
+        cls.ordering = ('firstname', 'lastname_key', 'id')
+        cls.expected = [
+            student.pk for student in
+            Students.objects.annotate(lastname_key=Coalesce('lastname', Value(''))).order_by(*cls.ordering)
+        ]
+
+    def paginator(self):
+        students = Students.objects.annotate(lastname_key=Coalesce('lastname', Value('')))
+        return KeysetPaginator(students, self.ordering, per_page=7)
+
+    def test_forward_and_back_visit_every_row_once(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([student.pk for page in pages for student in page], self.expected)
+        self.assertFalse(pages[0].has_previous)
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous:
+            backwards.append(paginator.page(backwards[-1].previous_cursor))
+        self.assertEqual(
+            [[student.pk for student in page] for page in reversed(backwards)],
+            [[student.pk for student in page] for page in pages],
+        )
+
+    def test_invalid_cursor_starts_over(self):
+        first = [student.pk for student in self.paginator().page()]
+        self.assertEqual([student.pk for student in self.paginator().page('not-a-cursor')], first)
+
+    def test_student_list_pages(self):
+        seen = []
+        url = reverse('studentRead')
+        while url:
+            page = self.client.get(url).context['page']
+            seen += [student.pk for student in page]
+            url = page.next_cursor and reverse('studentRead') + f'?cursor={page.next_cursor}'
+        self.assertEqual(seen, self.expected)
+
+
+class SampleDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.started = timezone.now()
+        SyntheticDataGenerator(scale=SAMPLE_SCALE, seed=3, stdout=io.StringIO()).run()
+
+    def test_enrollment_timestamps(self):
+        enrollments = list(Enrollment.objects.values_list('status', 'enrolled_at', 'completed_at', 'dropped_at'))
+        self.assertTrue(enrollments)
+        enrolled = [enrolled_at for _, enrolled_at, _, _ in enrollments]
+        # Spread over the window rather than all stamped at insert time
+        self.assertGreaterEqual(min(enrolled), self.started - ENROLLMENT_WINDOW - timedelta(minutes=1))
+        self.assertLess(min(enrolled), self.started - timedelta(days=30))
+        for status, enrolled_at, completed_at, dropped_at in enrollments:
+            self.assertEqual(completed_at is not None, status == 'completed')
+            self.assertEqual(dropped_at is not None, status == 'dropped')
+            for ended_at in filter(None, (completed_at, dropped_at)):
+                self.assertGreaterEqual(ended_at, enrolled_at)
+
+    def test_auto_now_add_is_untouched(self):
+        self.assertTrue(Enrollment._meta.get_field('enrolled_at').auto_now_add)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def snapshot(self):
+        """Counters as read from the cache, which must hold all of them."""
+        with self.assertNumQueries(0):
+            return stats.get_snapshot()
+
+    def save(self, obj, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save(**kwargs)
+
+    def test_counters_follow_creates_publishes_and_deletes(self):
+        Course.objects.create(title='Draft')
+        stats.refresh_snapshot()
+
+        course = Course(title='Live', is_published=True)
+        self.save(course)
+        self.assertEqual(self.snapshot()['course_count'], 2)
+        self.assertEqual(self.snapshot()['published_courses'], 1)
+
+        # Edits that leave the publish state alone keep the cached counter
+        course.title = 'Live and well'
+        self.save(course)
+        self.save(course, update_fields=['title'])
+        self.assertEqual(self.snapshot()['published_courses'], 1)
+
+        course.is_published = False
+        self.save(course)
+        self.assertEqual(self.snapshot()['published_courses'], 0)
+        course.is_published = True
+        self.save(course, update_fields=['is_published'])
+        self.assertEqual(self.snapshot()['published_courses'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        maintained = self.snapshot()
+        self.assertEqual(maintained, stats.refresh_snapshot())
+        self.assertEqual(maintained['published_courses'], 0)
+
+    def test_publish_changes_are_seen_without_rereading_the_course(self):
+        Course.objects.create(title='Loaded', is_published=True)
+        stats.refresh_snapshot()
+
+        course = Course.objects.get(title='Loaded')
+        course.is_published = False
+        with CaptureQueriesContext(connection) as queries:
+            self.save(course)
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"CoursePlatform_course"' in q['sql']])
+        self.assertEqual(self.snapshot()['published_courses'], 0)
 
-# Create your tests here.
+        # A deferred flag is unknown: recounted on the next read instead
+        course = Course.objects.only('title').get(pk=course.pk)
+        course.is_published = True
+        self.save(course)
+        self.assertEqual(stats.get_snapshot()['published_courses'], 1)
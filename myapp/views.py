@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
 from .models import Students
 from .forms import StudentsForm
-from CoursePlatform.models import Course
+from .stats import get_snapshot
+from myproject.pagination import KeysetPaginator
+
+STUDENTS_PER_PAGE = 25
 
 def base(request):
     return render(request,'base.html')
@@ -12,10 +15,7 @@ def base(request):
 def dashboard(request):
     """Dashboard view with statistics and recent activity"""
     context = {
-        'student_count': Students.objects.count(),
-        'course_count': Course.objects.count(),
-        'user_count': User.objects.count(),
-        'published_courses': Course.objects.filter(is_published=True).count(),
+        **get_snapshot(),
         'recent_students': Students.objects.all().order_by('-id')[:5],
         'now': timezone.now(),
     }
@@ -23,10 +23,11 @@ def dashboard(request):
 
 def home(request):
     """Home page with overview statistics"""
+    snapshot = get_snapshot()
     context = {
-        'student_count': Students.objects.count(),
-        'course_count': Course.objects.count(),
-        'user_count': User.objects.count(),
+        'student_count': snapshot['student_count'],
+        'course_count': snapshot['course_count'],
+        'user_count': snapshot['user_count'],
     }
     return render(request, 'home.html', context)
 
@@ -37,7 +38,8 @@ def home(request):
 def studentRead(request):
     search_query = request.GET.get("search", "").strip()
 
-    students = Students.objects.all().order_by("firstname", "lastname")
+    # lastname is nullable, so page on a coalesced key to keep comparisons total
+    students = Students.objects.annotate(lastname_key=Coalesce("lastname", Value("")))
 
     if search_query:
         q = Q(firstname__icontains=search_query) | Q(lastname__icontains=search_query)
@@ -49,8 +51,12 @@ def studentRead(request):
                 pass
         students = students.filter(q)
 
+    paginator = KeysetPaginator(students, ("firstname", "lastname_key", "id"), per_page=STUDENTS_PER_PAGE)
+    page = paginator.page(request.GET.get("cursor"))
+
     return render(request, "CRUD/read.html", {
-        "students": students,
+        "students": page.object_list,
+        "page": page,
         "search_query": search_query,
     })
 
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the benchmark management commands: the ``--seed-data``
+guard on writing to the database, latency sample collection, percentiles and
+a plain-text report.
+"""
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def add_seed_data_argument(parser, writes):
+    """Add ``--seed-data``, which a command writing ``writes`` needs outside DEBUG."""
+    parser.add_argument(
+        '--seed-data',
+        action='store_true',
+        help=f'Allow writing to the database: {writes}. Required unless DEBUG is on',
+    )
+
+
+def require_seed_data(options, writes, using=DEFAULT_DB_ALIAS):
+    """Refuse to write ``writes`` outside DEBUG unless ``--seed-data`` was passed."""
+    if not (options['seed_data'] or settings.DEBUG):
+        raise CommandError(
+            f"The benchmark writes {writes} to {connections[using].settings_dict['NAME']}; "
+            f"pass --seed-data to allow it"
+        )
+
+
+def percentile(samples, pct):
+    """Linearly interpolated percentile of ``samples`` (``pct`` in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Timings:
+    """Thread-safe collection of latency samples (seconds) grouped by label."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, label, seconds, ok=True):
+        with self._lock:
+            self.samples[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def summary(self, label):
+        samples = self.samples.get(label, [])
+        return {
+            'count': len(samples),
+            'errors': self.errors.get(label, 0),
+            'mean_ms': 1000 * sum(samples) / len(samples) if samples else 0.0,
+            'p50_ms': 1000 * percentile(samples, 50),
+            'p95_ms': 1000 * percentile(samples, 95),
+            'p99_ms': 1000 * percentile(samples, 99),
+            'max_ms': 1000 * max(samples, default=0.0),
+        }
+
+    def report(self, elapsed, label=None):
+        """
+        Lines of a fixed-width table, one row per label. Throughput is the
+        number of samples for the row divided by the wall-clock ``elapsed``.
+        """
+        header = f"{'':<28}{'count':>7}{'errors':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'req/s':>9}"
+        lines = [header]
+        for name in ([label] if label else sorted(self.samples)):
+            row = self.summary(name)
+            rate = row['count'] / elapsed if elapsed else 0.0
+            lines.append(
+                f"{name:<28}{row['count']:>7}{row['errors']:>8}"
+                f"{row['mean_ms']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}{rate:>9.1f}"
+            )
+        return lines
@@ -0,0 +1,32 @@
+"""
+Database routing for the SQLite production profile (see ``SQLITE_PROFILE``
+in settings): reads go to the read-only ``replica`` alias, writes and
+migrations to ``default``.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA_DB_ALIAS not in connections.settings:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == DEFAULT_DB_ALIAS:
+            # Related lookups of an object being written stay on its connection
+            return None
+        # Inside a transaction a read must see its own uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,202 @@
+"""
+Per-request instrumentation (opt in with ``INSTRUMENTATION_ENABLED``).
+
+``InstrumentationMiddleware`` records, for every request, the number of
+queries and the time spent in the database, in template rendering and in
+total, and sends them back in a ``Server-Timing`` header (shown in the
+browser's network panel). Queries are fingerprinted by their SQL with the
+parameters left out, so the same query issued once per row, the N+1
+pattern, shows up as one fingerprint with a high count and is logged.
+
+The last ``INSTRUMENTATION_SAMPLES`` requests of each view are kept in
+process memory and summarised by ``instrumentation_summary``.
+
+``INSTRUMENTATION_QUERY_BUDGETS`` maps view names to a maximum query count.
+With ``INSTRUMENTATION_ENFORCE_BUDGETS`` (meant for the test suite) a view
+over its budget raises ``QueryBudgetExceeded``; otherwise it is logged.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template.backends import django as django_backend
+
+from .benchmarking import percentile
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("instrumentation_request", default=None)
+
+# Literals, for SQL logged with its parameters interpolated
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+# Collapse "IN (%s, %s, ...)" and "VALUES (...), (...)" so batch sizes don't split fingerprints
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+VALUES_LIST = re.compile(r"VALUES (\([^)]*\))(?:, \([^)]*\))+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    sql = NUMBER_LITERAL.sub("%s", STRING_LITERAL.sub("%s", sql))
+    sql = IN_LIST.sub("IN (...)", sql)
+    return VALUES_LIST.sub(r"VALUES \1, ...", sql)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+        self._rendering = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold=2):
+        return {sql: count for sql, count in self.fingerprints.items() if count >= threshold}
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is None or stats._rendering:
+            return render(self, *args, **kwargs)
+        stats._rendering += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats._rendering -= 1
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install_template_timer():
+    """Time the top-level render of every Django template (idempotent)."""
+    template_class = django_backend.Template
+    if not getattr(template_class.render, "instrumented", False):
+        template_class.render = _timed_render(template_class.render)
+
+
+class ViewSamples:
+    """Rolling per-view samples, shared by the threads of one process."""
+
+    def __init__(self, size):
+        self.size = size
+        self._samples = defaultdict(lambda: deque(maxlen=self.size))
+        self._duplicates = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def add(self, view, sample, duplicates):
+        with self._lock:
+            self._samples[view].append(sample)
+            self._duplicates[view].update(duplicates.keys())
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._duplicates.clear()
+
+    def summary(self):
+        with self._lock:
+            views = {view: list(samples) for view, samples in self._samples.items()}
+            duplicates = {view: counter.most_common(5) for view, counter in self._duplicates.items()}
+        result = {}
+        for view, samples in sorted(views.items()):
+            queries = [sample["queries"] for sample in samples]
+            totals = [sample["total_ms"] for sample in samples]
+            result[view] = {
+                "requests": len(samples),
+                "queries_mean": round(sum(queries) / len(queries), 1),
+                "queries_max": max(queries),
+                "db_ms_mean": round(sum(sample["db_ms"] for sample in samples) / len(samples), 2),
+                "template_ms_mean": round(sum(sample["template_ms"] for sample in samples) / len(samples), 2),
+                "total_ms_p50": round(percentile(totals, 50), 2),
+                "total_ms_p95": round(percentile(totals, 95), 2),
+                # Fingerprints seen repeated within a request, with the number of such requests
+                "repeated_queries": [{"sql": sql, "requests": count} for sql, count in duplicates.get(view, [])],
+            }
+        return result
+
+
+samples = ViewSamples(getattr(settings, "INSTRUMENTATION_SAMPLES", 500))
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        view = view_name(request)
+        threshold = getattr(settings, "INSTRUMENTATION_DUPLICATE_THRESHOLD", 3)
+        duplicates = stats.duplicates(threshold)
+        for sql, count in duplicates.items():
+            logger.warning("Possible N+1 in %s: query ran %d times: %s", view, count, sql)
+
+        samples.add(view, {
+            "queries": stats.queries,
+            "db_ms": stats.db_time * 1000,
+            "template_ms": stats.template_time * 1000,
+            "total_ms": total * 1000,
+        }, duplicates)
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'dup;desc="{len(duplicates)} repeated queries"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        budget = getattr(settings, "INSTRUMENTATION_QUERY_BUDGETS", {}).get(view)
+        if budget is not None and stats.queries > budget:
+            message = f"{view} ran {stats.queries} queries, over its budget of {budget}"
+            if getattr(settings, "INSTRUMENTATION_ENFORCE_BUDGETS", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+@staff_member_required
+def instrumentation_summary(request):
+    """Rolling per-view query and latency figures of this process, as JSON."""
+    return JsonResponse({"samples_per_view": samples.size, "views": samples.summary()})
@@ -0,0 +1,161 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by an opaque cursor holding the ordering key of the row
+at the page boundary, so fetching page N is a single indexed range scan with
+no ``OFFSET`` and no ``COUNT(*)``. The ordering must end in a unique column
+(normally ``id``) for the page boundaries to be stable.
+"""
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision, which DjangoJSONEncoder truncates."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering`` (e.g. ``("-created_at", "-id")``).
+
+    Ordering names may refer to model fields or to annotations already on the
+    queryset; annotations are useful for keys that need ``Coalesce`` because
+    the underlying column is nullable.
+    """
+
+    def __init__(self, queryset, ordering, per_page=20):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.keys = [name.lstrip("-") for name in self.ordering]
+        self.descending = [name.startswith("-") for name in self.ordering]
+
+    def page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = NEXT, None
+
+        backwards = direction == PREVIOUS
+        qs = self.queryset
+        if values is not None:
+            qs = qs.filter(self._boundary_filter(values, backwards))
+        qs = qs.order_by(*self._ordering(backwards))
+
+        rows = list(qs[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else values is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], NEXT) if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], PREVIOUS) if has_previous else None,
+        )
+
+    def _ordering(self, backwards):
+        ordering = []
+        for key, descending in zip(self.keys, self.descending):
+            if backwards:
+                descending = not descending
+            ordering.append(f"-{key}" if descending else key)
+        return ordering
+
+    def _boundary_filter(self, values, backwards):
+        """
+        Rows strictly after ``values`` in page order, expanded as
+        ``a > x OR (a = x AND b > y) OR ...``. The leading ``a >= x`` term is
+        redundant but lets the database drive the scan from the index.
+        """
+        lookups = []
+        for key, descending in zip(self.keys, self.descending):
+            if backwards:
+                descending = not descending
+            lookups.append((key, "lt" if descending else "gt"))
+
+        clauses = []
+        for position, (key, op) in enumerate(lookups):
+            equal = {name: values[i] for i, (name, _) in enumerate(lookups[:position])}
+            clauses.append(Q(**equal, **{f"{key}__{op}": values[position]}))
+
+        first_key, first_op = lookups[0]
+        leading = Q(**{f"{first_key}__{first_op}e": values[0]})
+        return reduce(and_, [leading, reduce(or_, clauses)])
+
+    def encode_cursor(self, row, direction):
+        values = [getattr(row, key) for key in self.keys]
+        payload = json.dumps({"d": direction, "v": values}, cls=CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, values = payload["d"], payload["v"]
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor(cursor)
+        return direction, [self._to_python(key, value) for key, value in zip(self.keys, values)]
+
+    def _to_python(self, key, value):
+        try:
+            field = self.queryset.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise InvalidCursor(value)
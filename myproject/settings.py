@@ -23,9 +23,22 @@ STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 
 STRIPE_PUBLISHABLE_KEY = STRIPE_PUBLIC_KEY  # Template variable name
 
+# Signing secret of the webhook endpoint (CoursePlatform.webhooks.stripe_webhook)
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+
 if not STRIPE_PUBLIC_KEY or not STRIPE_SECRET_KEY:
     raise ValueError("STRIPE_PUBLIC_KEY and STRIPE_SECRET_KEY must be set in .env file")
 
+# Stripe clients. STRIPE_API_BASE points both the sync API calls and the
+# async client (CoursePlatform.stripe_utils.get_async_client) at another
+# server, e.g. CoursePlatform.fake_stripe.
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE') or None
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', 3))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', 10))
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', 2))
+STRIPE_RETRY_BUDGET_RATIO = float(os.getenv('STRIPE_RETRY_BUDGET_RATIO', 0.2))
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', 20))
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -63,6 +76,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'myproject.staticfiles.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,6 +115,57 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait on busy_timeout instead of failing with
+            # "database is locked" when a read lock can't be upgraded
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+    }
+}
+
+# SQLite production profile. SQLITE_PROFILE=production (the default when
+# DEBUG is off) switches the database to WAL, so readers no longer block on
+# the enrollment writer, tunes the per-connection pragmas, and adds a
+# read-only 'replica' alias on the same file that myproject.db.ReadReplicaRouter
+# sends reads to.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'development' if DEBUG else 'production')
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+if SQLITE_PROFILE == 'production':
+    _sqlite_pragmas = (
+        'PRAGMA busy_timeout = 5000;'
+        'PRAGMA synchronous = NORMAL;'
+        f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB};'
+        f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE};'
+        'PRAGMA temp_store = MEMORY;'
+    )
+    DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode = WAL;' + _sqlite_pragmas
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        'OPTIONS': {
+            'uri': True,
+            'timeout': 5,
+            'init_command': _sqlite_pragmas + 'PRAGMA query_only = ON;',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['myproject.db.ReadReplicaRouter']
+
+
+# Cache
+# Per-process memory by default. Point this at a shared cache (Redis or
+# Memcached) when running several workers so catalog and stats
+# invalidations reach all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'skillup'),
     }
 }
 
@@ -148,6 +213,23 @@ STATICFILES_DIRS = [
 # Static files collection directory for production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `manage.py collectstatic` writes content-hashed copies of the static files,
+# a staticfiles.json manifest and .gz/.br siblings to STATIC_ROOT. Once the
+# manifest exists, myproject.staticfiles.PrecompressedStaticMiddleware serves
+# them with immutable cache headers in the encoding the browser accepts.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': os.environ.get('STATICFILES_STORAGE', 'myproject.staticfiles.CompressedManifestStaticFilesStorage'),
+    },
+}
+
+# User uploads (course thumbnails and their resized variants)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -157,4 +239,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = 'profile'
 LOGOUT_REDIRECT_URL = 'login'
 
-EMAIL_BACKEND = 'django.core.email.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.email.backends.console.EmailBackend'
+
+# Course catalog search
+# Dotted path to the backend used by CoursePlatform.search; the FTS5 backend
+# needs SQLite, use CoursePlatform.search.SimpleSearchBackend elsewhere.
+COURSE_SEARCH_BACKEND = os.environ.get('COURSE_SEARCH_BACKEND', 'CoursePlatform.search.SQLiteFTSSearchBackend')
+
+# Catalog page cache (CoursePlatform.catalog_cache): max pages kept per
+# process and their lifetime in seconds
+COURSE_LIST_CACHE_SIZE = int(os.environ.get('COURSE_LIST_CACHE_SIZE', 512))
+COURSE_LIST_CACHE_TTL = int(os.environ.get('COURSE_LIST_CACHE_TTL', 300))
+
+# Course list and detail pages (CoursePlatform.conditional): seconds browsers
+# and shared caches may reuse an anonymous page before revalidating it
+COURSE_PAGE_MAX_AGE = int(os.environ.get('COURSE_PAGE_MAX_AGE', 60))
+
+# Dashboard counters (myapp.stats): tables estimated above this many rows
+# report the database's row estimate instead of an exact COUNT(*)
+STATS_EXACT_COUNT_LIMIT = int(os.environ.get('STATS_EXACT_COUNT_LIMIT', 500_000))
+
+# Request instrumentation (myproject.instrumentation), off by default. When
+# on, every response carries a Server-Timing header with its query count, DB,
+# template and total time, repeated queries (N+1) are logged, and staff can
+# read per-view figures at /__instrumentation__/. Views over their query
+# budget are logged, or fail with INSTRUMENTATION_ENFORCE_BUDGETS (tests).
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'False').lower() == 'true'
+INSTRUMENTATION_SAMPLES = 500
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3
+INSTRUMENTATION_ENFORCE_BUDGETS = False
+INSTRUMENTATION_QUERY_BUDGETS = {
+    'courseplatform:course_list': 6,
+    'courseplatform:course_detail': 8,
+    'dashboardName': 8,
+    'homeName': 6,
+}
+if INSTRUMENTATION_ENABLED:
+    MIDDLEWARE.insert(0, 'myproject.instrumentation.InstrumentationMiddleware')
+
+# Multiplier for the wall-time ceilings of the view budget tests
+# (myproject.testing). They are loose already; raise this on slow machines
+# (coverage runs, emulated CPUs) rather than turning the checks off
+TEST_TIME_BUDGET_SCALE = float(os.environ.get('TEST_TIME_BUDGET_SCALE', '1.0'))
+
+# Thumbnail variants (CoursePlatform.thumbnails): widths rendered for srcset,
+# output formats, encoder quality and the size of the rendering process pool.
+# THUMBNAIL_BACKGROUND = False renders inline at upload instead.
+THUMBNAIL_WIDTHS = (320, 640, 960, 1280)
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 0)) or None
+THUMBNAIL_BACKGROUND = os.environ.get('THUMBNAIL_BACKGROUND', 'True').lower() == 'true'
@@ -0,0 +1,172 @@
+"""
+Static asset pipeline.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` copies the
+files to ``STATIC_ROOT``, renames them after a hash of their content
+(``js/enroll-button.3f2a9c1b7e4d.js``, recorded in ``staticfiles.json``) and
+writes a gzip and a brotli copy next to every compressible file.
+
+``PrecompressedStaticMiddleware`` serves ``STATIC_URL`` from ``STATIC_ROOT``:
+it picks the ``.br`` or ``.gz`` copy the client accepts, and sends hashed
+names with a one-year immutable cache lifetime, since their content can never
+change under that name.
+"""
+import gzip
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip copies are written without it
+    brotli = None
+
+# Content worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".xml", ".ico",
+}
+# Below this size the encoding overhead outweighs the savings
+MIN_COMPRESS_SIZE = 256
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Unhashed names may change on the next deploy
+DEFAULT_MAX_AGE = 60 * 10
+
+# (suffix, Content-Encoding) in order of preference
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+
+def compress(path):
+    """
+    Write ``<path>.gz`` and ``<path>.br`` next to ``path``, keeping only the
+    copies that are smaller than the original. Returns the names written.
+    """
+    data = path.read_bytes()
+    written = []
+    candidates = [(".gz", lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.append((".br", lambda: brotli.compress(data, quality=11)))
+    for suffix, encode in candidates:
+        target = path.with_name(path.name + suffix)
+        encoded = encode()
+        if len(encoded) < len(data):
+            target.write_bytes(encoded)
+            written.append(target)
+        elif target.exists():
+            target.unlink()
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also precompresses the files it collects.
+
+    Not strict: a ``{% static %}`` reference to a file that was never
+    collected renders its plain name (and 404s) instead of failing the page.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not in the manifest nor in STATIC_ROOT
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Compress the final files: both the original and the hashed names
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if posixpath.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = Path(self.path(name))
+            if path.is_file() and path.stat().st_size >= MIN_COMPRESS_SIZE:
+                compress(path)
+
+
+def parse_accept_encoding(header):
+    """Content codings the client accepts (``q=0`` excluded)."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Serve collected static files with far-future caching and precompressed
+    variants. Inactive until ``collectstatic`` has written the manifest; in
+    development ``runserver`` keeps serving from the app directories.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith("/") else f"/{settings.STATIC_URL}"
+        self.root = Path(settings.STATIC_ROOT).resolve() if settings.STATIC_ROOT else None
+        hashed_files = getattr(staticfiles_storage, "hashed_files", None) or {}
+        self.immutable = set(hashed_files.values())
+
+    def __call__(self, request):
+        if (
+            self.root is not None
+            and self.immutable
+            and request.method in ("GET", "HEAD")
+            and request.path_info.startswith(self.prefix)
+        ):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        name = posixpath.normpath(name).lstrip("/")
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root) or not path.is_file() or path.suffix in (".gz", ".br"):
+            return None
+
+        accepted = parse_accept_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        served, encoding = path, None
+        for suffix, coding in ENCODINGS:
+            variant = path.with_name(path.name + suffix)
+            if coding in accepted and variant.is_file():
+                served, encoding = variant, coding
+                break
+
+        stat = path.stat()
+        if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path.name)
+            response = FileResponse(
+                served.open("rb"), content_type=content_type or "application/octet-stream", filename=path.name,
+            )
+            response["Content-Length"] = served.stat().st_size
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if name in self.immutable:
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=DEFAULT_MAX_AGE)
+        return response
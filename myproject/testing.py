@@ -0,0 +1,80 @@
+"""
+Test helpers for query-count and latency budgets.
+
+``QueryBudgetMixin.assertWithinBudget`` requests a URL with caches cleared,
+counts the queries it issues on the test's databases and fails, listing the
+SQL, when the count is over budget. It also fails when the request takes
+longer than its wall-time ceiling; those are deliberately loose, and
+``TEST_TIME_BUDGET_SCALE`` stretches them on slow machines.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from .instrumentation import fingerprint
+
+# Lines of SQL shown when a budget fails
+MAX_REPORTED_QUERIES = 50
+
+# Wall-time ceilings are loose: they catch order-of-magnitude regressions,
+# not noise on a busy CI machine
+DEFAULT_MAX_SECONDS = 1.0
+
+
+def format_queries(captured):
+    """The captured SQL, most repeated fingerprints first, then in order."""
+    counts = {}
+    for query in captured:
+        key = fingerprint(query["sql"])
+        counts[key] = counts.get(key, 0) + 1
+    repeated = sorted(((count, sql) for sql, count in counts.items() if count > 1), reverse=True)
+    lines = ["Repeated queries:"] + [f"  {count} x {sql}" for count, sql in repeated]
+    lines.append("Queries:")
+    lines += [f"  {number}. {query['sql']}" for number, query in enumerate(captured[:MAX_REPORTED_QUERIES], 1)]
+    if len(captured) > MAX_REPORTED_QUERIES:
+        lines.append(f"  ... and {len(captured) - MAX_REPORTED_QUERIES} more")
+    return "\n".join(lines)
+
+
+class QueryBudgetMixin:
+    # Callables emptying caches outside the cache framework (per-process
+    # page caches and the like) that a measured request could be served from
+    cache_clearers = ()
+
+    def clear_caches(self):
+        cache.clear()
+        for clear in self.cache_clearers:
+            clear()
+
+    def assertWithinBudget(self, url, queries, seconds=DEFAULT_MAX_SECONDS, status=200, client=None):
+        """
+        GET ``url`` once to warm template loading, clear the data caches, then
+        GET it again and assert the second request's status, query count and
+        wall time. Returns the response.
+        """
+        client = client or self.client
+        client.get(url)
+        self.clear_caches()
+
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections if alias in self.databases
+            ]
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, status, f"GET {url}")
+        captured = [query for context in contexts for query in context.captured_queries]
+        if len(captured) > queries:
+            self.fail(
+                f"GET {url} ran {len(captured)} queries, over its budget of {queries}\n{format_queries(captured)}"
+            )
+        seconds *= getattr(settings, "TEST_TIME_BUDGET_SCALE", 1.0)
+        self.assertLessEqual(elapsed, seconds, f"GET {url} took {elapsed:.3f}s, over its budget of {seconds}s")
+        return response
@@ -0,0 +1,114 @@
+import gzip
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from . import instrumentation, staticfiles
+from .testing import QueryBudgetMixin
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.script = self.root / 'js' / 'app.0123456789ab.js'
+        self.script.parent.mkdir()
+        self.script.write_text('console.log("hello");\n' * 100)
+        self.factory = RequestFactory()
+
+    def middleware(self):
+        with override_settings(STATIC_ROOT=str(self.root), STATIC_URL='/static/'):
+            middleware = staticfiles.PrecompressedStaticMiddleware(lambda request: HttpResponse('app'))
+        middleware.immutable = {'js/app.0123456789ab.js'}
+        return middleware
+
+    def test_compress_keeps_smaller_copies(self):
+        written = staticfiles.compress(self.script)
+        gz = self.script.with_name(self.script.name + '.gz')
+        self.assertIn(gz, written)
+        self.assertEqual(gzip.decompress(gz.read_bytes()), self.script.read_bytes())
+
+        tiny = self.root / 'tiny.js'
+        tiny.write_text('x')
+        self.assertEqual(staticfiles.compress(tiny), [])
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(staticfiles.parse_accept_encoding('gzip, br;q=0, deflate;q=0.5'), {'gzip', 'deflate'})
+        self.assertEqual(staticfiles.parse_accept_encoding(''), set())
+
+    def test_middleware_serves_the_accepted_encoding(self):
+        staticfiles.compress(self.script)
+        middleware = self.middleware()
+
+        response = middleware(self.factory.get('/static/js/app.0123456789ab.js', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.script.read_bytes())
+        response.close()
+
+        response = middleware(self.factory.get('/static/js/app.0123456789ab.js'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response.close()
+
+    def test_middleware_passes_through_other_paths(self):
+        middleware = self.middleware()
+        self.assertEqual(middleware(self.factory.get('/static/../secret.txt')).content, b'app')
+        self.assertEqual(middleware(self.factory.get('/static/js/missing.js')).content, b'app')
+        self.assertEqual(middleware(self.factory.get('/courses/')).content, b'app')
+
+
+def user_lookups(request, count=4):
+    # The same query once per id: the N+1 pattern
+    for pk in range(count):
+        get_user_model().objects.filter(pk=pk).exists()
+    return HttpResponse('ok')
+
+
+@override_settings(INSTRUMENTATION_DUPLICATE_THRESHOLD=3, INSTRUMENTATION_QUERY_BUDGETS={})
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.samples.clear()
+        self.addCleanup(instrumentation.samples.clear)
+        self.request = RequestFactory().get('/')
+
+    def test_fingerprint_ignores_parameters_and_batch_sizes(self):
+        self.assertEqual(
+            instrumentation.fingerprint("SELECT 1 FROM t WHERE a = 12 AND b = 'x''y' AND c IN (%s, %s)"),
+            instrumentation.fingerprint("SELECT 1 FROM t WHERE a = 7 AND b = 'z' AND c IN (%s)"),
+        )
+
+    def test_server_timing_and_repeated_queries(self):
+        middleware = instrumentation.InstrumentationMiddleware(user_lookups)
+        with self.assertLogs('myproject.instrumentation', 'WARNING') as logs:
+            response = middleware(self.request)
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+        self.assertIn('desc="1 repeated queries"', response['Server-Timing'])
+        self.assertIn('Possible N+1 in <unresolved>: query ran 4 times', logs.output[0])
+
+        summary = instrumentation.samples.summary()['<unresolved>']
+        self.assertEqual((summary['requests'], summary['queries_max']), (1, 4))
+        self.assertEqual(summary['repeated_queries'][0]['requests'], 1)
+
+    def test_query_budgets(self):
+        middleware = instrumentation.InstrumentationMiddleware(lambda request: user_lookups(request, count=2))
+        with override_settings(INSTRUMENTATION_QUERY_BUDGETS={'<unresolved>': 1}):
+            with self.assertLogs('myproject.instrumentation', 'WARNING'):
+                self.assertEqual(middleware(self.request).status_code, 200)
+            with override_settings(INSTRUMENTATION_ENFORCE_BUDGETS=True):
+                with self.assertRaisesMessage(instrumentation.QueryBudgetExceeded, 'over its budget of 1'):
+                    middleware(self.request)
+        with override_settings(INSTRUMENTATION_QUERY_BUDGETS={'<unresolved>': 2}, INSTRUMENTATION_ENFORCE_BUDGETS=True):
+            self.assertEqual(middleware(self.request).status_code, 200)
+
+
+class QueryBudgetMixinTests(QueryBudgetMixin, TestCase):
+    def test_wall_time_is_enforced_by_default(self):
+        self.assertWithinBudget('/accounts/login/', queries=0)
+        with override_settings(TEST_TIME_BUDGET_SCALE=0):
+            with self.assertRaisesMessage(AssertionError, 'over its budget of 0'):
+                self.assertWithinBudget('/accounts/login/', queries=0)
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from userAuth import views as accounts_views
@@ -18,3 +20,11 @@ urlpatterns = [
     path('accounts/profile/', accounts_views.profile, name='profile'),
     path('accounts/edit_profile/', accounts_views.edit_profile, name='edit_profile'),
 ]
+
+if settings.INSTRUMENTATION_ENABLED:
+    from myproject.instrumentation import instrumentation_summary
+
+    urlpatterns.append(path('__instrumentation__/', instrumentation_summary, name='instrumentation_summary'))
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,3 +1,68 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from myproject.testing import QueryBudgetMixin
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query-count and wall-time ceilings of the sign-in and profile pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('perf-user', password='x')
+
+    def setUp(self):
+        self.clear_caches()
+
+    def test_login_form(self):
+        self.assertWithinBudget(reverse('login'), queries=0)
+
+    def test_register_form(self):
+        self.assertWithinBudget(reverse('register'), queries=0)
+
+    def test_profile(self):
+        self.client.force_login(self.user)
+        self.assertWithinBudget(reverse('profile'), queries=2)
+
+    def test_edit_profile_form(self):
+        self.client.force_login(self.user)
+        self.assertWithinBudget(reverse('edit_profile'), queries=2)
+
+
+class AccountViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('ana', password='correct-horse-battery')
+
+    def test_login(self):
+        response = self.client.post(reverse('login'), {'username': 'ana', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        response = self.client.post(reverse('login'), {'username': 'ana', 'password': 'correct-horse-battery'})
+        self.assertRedirects(response, reverse('profile'))
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+    def test_register_signs_the_new_user_in(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'ben', 'password1': 'a-long-enough-password', 'password2': 'a-long-enough-password',
+        })
+        self.assertRedirects(response, reverse('profile'))
+        user = get_user_model().objects.get(username='ben')
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+
+    def test_profile_requires_login(self):
+        for name in ('profile', 'edit_profile'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertRedirects(response, f"{reverse('login')}?next={reverse(name)}")
+
+    def test_edit_profile(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('edit_profile'), {
+            'username': 'ana', 'first_name': 'Ana', 'last_name': 'Khan', 'email': 'ana@example.com',
+        })
+        self.assertRedirects(response, reverse('profile'))
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.email), ('Ana', 'ana@example.com'))